@@ -18,6 +18,7 @@
         "data/fastapi_jwt_data.xml",
         "views/fastapi_jwt_auth_view.xml",
         "views/fastapi_jwt_endpoint_view.xml",
+        "views/fastapi_jwt_refresh_token_view.xml",
     ],
-    "external_dependencies": {"python": ["pydantic"]},
+    "external_dependencies": {"python": ["pydantic", "pyjwt"]},
 }
@@ -0,0 +1,2 @@
+# Benchmarks are run by hand from an Odoo shell, they are not loaded with
+# the module.
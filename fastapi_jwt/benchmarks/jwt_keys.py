@@ -0,0 +1,59 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+"""Tokens/sec issued and verified with and without the cached JWT context.
+
+Run it from an Odoo shell of a database where fastapi_jwt is installed::
+
+    $ odoo-bin shell -d <db>
+    >>> from odoo.addons.fastapi_jwt.benchmarks import jwt_keys
+    >>> jwt_keys.run(env, validator_id=1)
+"""
+
+import time
+
+PAYLOAD = {"sub": "2", "name": "Benchmark"}
+
+
+def _rate(func, duration):
+    count = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        func()
+        count += 1
+    return count / duration
+
+
+def run(env, validator_id, duration=2.0):
+    validator = env["auth.jwt.validator"].sudo().browse(validator_id)
+    context = validator._get_jwt_context()
+    token = context.encode(PAYLOAD)
+
+    def issue_before():
+        validator.invalidate_recordset()
+        validator._encode(PAYLOAD, validator.secret_key, validator.token_duration)
+        return validator.next_validator_id
+
+    def verify_before():
+        validator.invalidate_recordset()
+        return validator._decode(token, validator.secret_key)
+
+    def issue_after():
+        validator._get_jwt_context().encode(PAYLOAD)
+        return validator._get_next_validator()
+
+    def verify_after():
+        return validator._get_jwt_context().decode(token)
+
+    results = {
+        "issue_before": _rate(issue_before, duration),
+        "issue_after": _rate(issue_after, duration),
+        "verify_before": _rate(verify_before, duration),
+        "verify_after": _rate(verify_after, duration),
+    }
+    for name in ("issue", "verify"):
+        before, after = results[f"{name}_before"], results[f"{name}_after"]
+        print(
+            f"{name:>6}: {before:10.0f} tokens/s before, {after:10.0f} tokens/s "
+            f"after (x{after / before:.2f})"
+        )
+    return results
@@ -0,0 +1,167 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+"""Latency and throughput of the Ontinet JWT routes.
+
+The endpoint app is served in-process through the FastAPI test client, each
+request running in its own committed cursor like the Odoo dispatcher does.
+Use a scratch database: logins and refresh token rotations are written.
+
+    $ odoo-bin shell -d <db>
+    >>> from odoo.addons.fastapi_jwt.benchmarks import routes
+    >>> routes.run(env, "/v1", "bench@example.com", "bench", concurrency=8)
+
+Every scenario reports p50/p95/p99 latency, requests/sec and the mean time
+of each stage (decode, user lookup, password, encode) taken from the
+``Server-Timing`` header of the responses.
+"""
+
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from odoo import api
+from odoo.tools import config
+
+from odoo.addons.fastapi.dependencies import odoo_env
+
+from ..timing import parse_server_timing
+
+
+class _Scenario:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.stages = {}
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency, response):
+        stages = parse_server_timing(response.headers.get("Server-Timing"))
+        with self.lock:
+            if response.status_code >= 400:
+                self.errors += 1
+            self.latencies.append(latency)
+            for stage, duration in stages.items():
+                self.stages.setdefault(stage, []).append(duration)
+
+    def report(self, elapsed):
+        latencies = sorted(self.latencies)
+        if len(latencies) > 1:
+            centiles = statistics.quantiles(latencies, n=100)
+        else:
+            centiles = latencies * 99
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "rps": len(latencies) / elapsed,
+            "p50": centiles[49] * 1000,
+            "p95": centiles[94] * 1000,
+            "p99": centiles[98] * 1000,
+            "stages": {
+                stage: statistics.fmean(durations)
+                for stage, durations in sorted(self.stages.items())
+            },
+        }
+
+
+def _make_app(env, root_path):
+    endpoint = env["fastapi.endpoint"].sudo().search([("root_path", "=", root_path)])
+    endpoint.ensure_one()
+    registry = env.registry
+    uid = endpoint.user_id.id or env.uid
+
+    def request_env():
+        with registry.cursor() as cr:
+            yield api.Environment(cr, uid, {})
+
+    app = endpoint._get_app()
+    app.dependency_overrides[odoo_env] = request_env
+    return app
+
+
+def _timed(client, scenario, method, url, **kwargs):
+    start = time.perf_counter()
+    response = client.request(method, url, **kwargs)
+    scenario.record(time.perf_counter() - start, response)
+    return response
+
+
+def _run_scenario(app, scenario, concurrency, requests, setup, step):
+    """Run ``requests`` calls of ``step`` spread on ``concurrency`` threads.
+
+    ``setup(client)`` prepares the per-thread state that ``step(client,
+    state)`` consumes and returns updated.
+    """
+    per_thread = max(requests // concurrency, 1)
+
+    def worker():
+        client = TestClient(app)
+        state = setup(client)
+        for _i in range(per_thread):
+            state = step(client, state)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _i in range(concurrency)]:
+            future.result()
+    return scenario.report(time.perf_counter() - start)
+
+
+def run(env, root_path, login, password, concurrency=4, requests=200):
+    app = _make_app(env, root_path)
+    credentials = {"email": login, "password": password}
+    previous_timing = config.get("fastapi_jwt_server_timing")
+    config["fastapi_jwt_server_timing"] = True
+
+    def login_tokens(client):
+        return client.post("/token", params=credentials).json()
+
+    issue = _Scenario("issue")
+    verify = _Scenario("verify")
+    refresh = _Scenario("refresh")
+
+    def issue_step(client, state):
+        _timed(client, issue, "POST", "/token", params=credentials)
+
+    def verify_step(client, tokens):
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        _timed(client, verify, "GET", "/protected", headers=headers)
+        return tokens
+
+    def refresh_step(client, tokens):
+        headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+        response = _timed(client, refresh, "POST", "/refresh", headers=headers)
+        # Refresh tokens are single use, chain on the rotated one
+        if response.status_code != 200:
+            return login_tokens(client)
+        return response.json()
+
+    try:
+        results = {
+            "issue": _run_scenario(
+                app, issue, concurrency, requests, lambda client: None, issue_step
+            ),
+            "verify": _run_scenario(
+                app, verify, concurrency, requests, login_tokens, verify_step
+            ),
+            "refresh": _run_scenario(
+                app, refresh, concurrency, requests, login_tokens, refresh_step
+            ),
+        }
+    finally:
+        config["fastapi_jwt_server_timing"] = previous_timing
+
+    print(f"concurrency={concurrency}")
+    for name, result in results.items():
+        stages = ", ".join(
+            f"{stage}={duration:.2f}ms" for stage, duration in result["stages"].items()
+        )
+        print(
+            f"{name:>8}: {result['rps']:8.1f} req/s  p50={result['p50']:7.2f}ms  "
+            f"p95={result['p95']:7.2f}ms  p99={result['p99']:7.2f}ms  "
+            f"errors={result['errors']}  [{stages}]"
+        )
+    return results
@@ -0,0 +1,36 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ExpiringCache:
+    """Bounded, thread-safe mapping of entries valid until an epoch deadline.
+
+    Deadlines are compared with ``time.time()`` like the ``exp`` claim of the
+    tokens; when full, the oldest entries are evicted first.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires_at, value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
@@ -1,2 +1,3 @@
 from . import fastapi_endpoint
 from . import fastapi_auth_jwt
+from . import fastapi_jwt_refresh_token
@@ -1,10 +1,84 @@
 # Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
 
+import time
+import uuid
+
+import jwt
 from fastapi import HTTPException, status
+from jwt.algorithms import get_default_algorithms
+
+from odoo import fields, models, tools
+
+
+class JwtContext:
+    """Signing material of a validator, prepared once per worker.
 
-from odoo import SUPERUSER_ID, api, fields, models
-from odoo.http import request
+    Mirrors ``auth.jwt.validator._encode`` / ``_decode`` when they are given
+    the validator secret (HS256), without re-reading the record or re-parsing
+    the key on every token.
+    """
+
+    __slots__ = (
+        "algorithm",
+        "key",
+        "audience",
+        "audiences",
+        "issuer",
+        "token_duration",
+        "next_validator_id",
+        "options",
+    )
+
+    def __init__(self, validator):
+        self.algorithm = "HS256"
+        self.key = get_default_algorithms()[self.algorithm].prepare_key(
+            validator.secret_key
+        )
+        self.audience = validator.audience
+        self.audiences = validator.audience.split(",")
+        self.issuer = validator.issuer
+        self.token_duration = validator.token_duration
+        self.next_validator_id = validator.next_validator_id.id
+        self.options = {
+            "require": ["exp", "aud", "iss"],
+            "verify_exp": True,
+            "verify_aud": True,
+            "verify_iss": True,
+        }
+
+    def encode(self, payload):
+        now = int(time.time())
+        payload = dict(
+            payload,
+            iat=now,
+            exp=now + self.token_duration,
+            aud=self.audience,
+            iss=self.issuer,
+        )
+        return jwt.encode(payload, key=self.key, algorithm=self.algorithm)
+
+    def decode(self, token):
+        return jwt.decode(
+            token,
+            key=self.key,
+            algorithms=[self.algorithm],
+            options=self.options,
+            audience=self.audiences,
+            issuer=self.issuer,
+        )
+
+
+def encode_token_pairs(access_context, refresh_context, payloads):
+    """Sign an access and a refresh token for each ``(payload, jti)``.
+
+    Pure CPU work on prepared :class:`JwtContext`, safe to run outside of the
+    request thread.
+    """
+    return [
+        (access_context.encode(payload), refresh_context.encode(dict(payload, jti=jti)))
+        for payload, jti in payloads
+    ]
 
 
 class FastapiAuthJwt(models.Model):
@@ -22,17 +96,117 @@ class FastapiAuthJwt(models.Model):
         required=True,
     )
 
-    def generate_jwt_token(self, user_id, validator_jwt):
+    def generate_jwt_token(self, user_id, validator_jwt, jti=None):
         if not validator_jwt:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        env = api.Environment(request.cr, SUPERUSER_ID, {})
-        user = env["res.users"].sudo().browse(user_id)
-        expire = validator_jwt.token_duration
+        user = self.env["res.users"].sudo().browse(user_id)
         payload = {
             "sub": str(user_id),
             "name": user.name,
         }
+        if jti:
+            payload["jti"] = jti
+
+        token = validator_jwt._get_jwt_context().encode(payload)
+        return token
 
-        token = validator_jwt._encode(payload, validator_jwt.secret_key, expire)
+    def generate_refresh_token(self, user_id, jti=None):
+        """Issue a refresh token with the next validator and store its id so it
+        can be rotated or revoked."""
+        refresh_validator = self._get_next_validator()
+        jti = jti or uuid.uuid4().hex
+        token = self.generate_jwt_token(user_id, refresh_validator, jti=jti)
+        self.env["fastapi.jwt.refresh.token"]._register_tokens(
+            refresh_validator, [(jti, user_id)]
+        )
         return token
+
+    def generate_jwt_tokens(self, user_ids):
+        """Issue an access and a refresh token for each active user of
+        ``user_ids``, reading all of them with a single query.
+
+        :return: list of dicts with ``user_id``, ``access_token`` and
+                 ``refresh_token``
+        """
+        refresh_validator, payloads = self._prepare_jwt_tokens(user_ids)
+        pairs = encode_token_pairs(
+            self._get_jwt_context(), refresh_validator._get_jwt_context(), payloads
+        )
+        return self._register_jwt_tokens(refresh_validator, payloads, pairs)
+
+    def _prepare_jwt_tokens(self, user_ids):
+        """Database half of :meth:`generate_jwt_tokens`, before signing.
+
+        :return: tuple ``(refresh_validator, payloads)``, ``payloads`` being a
+                 list of ``(payload, jti)``, one per active user
+        """
+        self.ensure_one()
+        refresh_validator = self._get_next_validator()
+        if not refresh_validator:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        users = (
+            self.env["res.users"].sudo().search_read([("id", "in", user_ids)], ["name"])
+        )
+        payloads = [
+            ({"sub": str(user["id"]), "name": user["name"]}, uuid.uuid4().hex)
+            for user in users
+        ]
+        return refresh_validator, payloads
+
+    def _register_jwt_tokens(self, refresh_validator, payloads, pairs):
+        """Store the refresh tokens signed by :func:`encode_token_pairs`.
+
+        :return: list of dicts with ``user_id``, ``access_token`` and
+                 ``refresh_token``
+        """
+        self.env["fastapi.jwt.refresh.token"]._register_tokens(
+            refresh_validator,
+            [(jti, int(payload["sub"])) for payload, jti in payloads],
+        )
+        return [
+            {
+                "user_id": int(payload["sub"]),
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+            }
+            for (payload, _jti), (access_token, refresh_token) in zip(
+                payloads, pairs
+            )
+        ]
+
+    @tools.ormcache("self.id")
+    def _get_jwt_context(self):
+        """Return the :class:`JwtContext` of this validator, cached per worker
+        until a validator is written."""
+        self.ensure_one()
+        return JwtContext(self.sudo())
+
+    def _get_next_validator(self):
+        """Validator of the refresh tokens, without reading it from database."""
+        return self.browse(self._get_jwt_context().next_validator_id)
+
+    def _verify_token(self, token):
+        """Decode ``token`` and resolve the active user it was issued for.
+
+        Invalid tokens raise. Results are cached by
+        :func:`~odoo.addons.fastapi_jwt.models.fastapi_endpoint.verify_token`.
+
+        :return: tuple ``(payload, user_id)``, ``user_id`` is False when the
+                 user no longer exists or has been archived
+        """
+        payload = self._get_jwt_context().decode(token)
+        user_id = int(payload.get("sub") or 0)
+        user = self.env["res.users"].sudo().search([("id", "=", user_id)], limit=1)
+        return payload, user.id
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -1,13 +1,38 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
-from odoo import _, fields, models
+from odoo import _, api, fields, models
 from odoo.http import request
+from odoo.tools import config
+
+from odoo.addons.fastapi.dependencies import fastapi_endpoint, odoo_env
 
-from odoo.addons.fastapi.dependencies import fastapi_endpoint
+from ..cache import ExpiringCache
+from ..schemas import TokenBatchRequest, TokenBatchResponse
+from ..timing import ServerTiming, server_timing
+from .fastapi_auth_jwt import encode_token_pairs
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 ontinet_api_router = APIRouter()
+ontinet_async_api_router = APIRouter()
+
+# (database, validator id, sha256 of the token) -> (signing context, payload,
+# user id) of the tokens verified by this worker, kept until the token expires
+_verified_tokens = ExpiringCache(max_size=10000)
+VERIFIED_TOKEN_MAX_TTL = 300
+
+# Bounded pool running password hashing and token signing of the async routes
+_signing_executor = None
+_signing_executor_lock = threading.Lock()
 
 
 class FastapiEndpoint(models.Model):
@@ -19,23 +44,98 @@ class FastapiEndpoint(models.Model):
         selection_add=[("ontinetjwt", "Ontinet JWT")],
         ondelete={"ontinetjwt": "cascade"},
     )
+    jwt_async_handlers = fields.Boolean(
+        string="Rutas asíncronas",
+        help="Sirve las rutas como manejadores async. El hash de contraseñas y "
+        "la firma de tokens se ejecutan en un pool de hilos dedicado y acotado "
+        "(opción fastapi_jwt_executor_workers del servidor, 4 por defecto).",
+    )
+
+    @api.model
+    def _fastapi_app_fields(self) -> list[str]:
+        return super()._fastapi_app_fields() + ["jwt_async_handlers", "validator_jwt"]
+
+    def _get_app_dependencies_overrides(self):
+        res = super()._get_app_dependencies_overrides()
+        res[jwt_validator_id] = functools.partial(lambda a: a, self.validator_jwt.id)
+        return res
 
     def _get_fastapi_routers(self) -> list[APIRouter]:
         if self.app == "ontinetjwt":
+            if self.jwt_async_handlers:
+                return [ontinet_async_api_router]
             return [ontinet_api_router]
         return super()._get_fastapi_routers()
 
 
+class Principal:
+    """User authenticated by the claims of a verified token alone."""
+
+    __slots__ = ("user_id", "name", "issued_at", "expires_at", "claims")
+
+    def __init__(self, claims):
+        self.user_id = int(claims["sub"])
+        self.name = claims.get("name")
+        self.issued_at = claims.get("iat")
+        self.expires_at = claims["exp"]
+        self.claims = claims
+
+    def __repr__(self):
+        return f"<Principal user_id={self.user_id} name={self.name!r}>"
+
+
+def jwt_validator_id() -> int:
+    """Id of the endpoint JWT validator, set by the app dependency overrides so
+    that it is known without reading the endpoint."""
+    return 0
+
+
 def decode_token(validator, token):
     try:
-        return validator._decode(token, validator.secret_key)
+        return validator._get_jwt_context().decode(token)
     except Exception:
         return None
 
 
+def verify_token(validator, token):
+    """Cached variant of :func:`decode_token` that also resolves the user.
+
+    Valid tokens are kept in a bounded cache of this worker until they expire.
+    An entry is only trusted while the validator signing context it was
+    verified with is still current: any registry cache invalidation (a
+    validator written, a user archived...) renews that context and thus
+    discards the entry.
+
+    :return: tuple ``(payload, user_id)``, ``(None, False)`` for invalid tokens
+    """
+    context = validator._get_jwt_context()
+    key = (
+        validator.env.cr.dbname,
+        validator.id,
+        hashlib.sha256(token.encode()).hexdigest(),
+    )
+    entry = _verified_tokens.get(key)
+    if entry and entry[0] is context:
+        payload, user_id = entry[1], entry[2]
+    else:
+        try:
+            payload, user_id = validator._verify_token(token)
+        except Exception:
+            return None, False
+        _verified_tokens.set(
+            key,
+            (context, payload, user_id),
+            min(payload.get("exp", 0), time.time() + VERIFIED_TOKEN_MAX_TTL),
+        )
+    if payload.get("exp", 0) <= time.time():
+        return None, False
+    return dict(payload), user_id
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     endpoint=Depends(fastapi_endpoint),  # noqa: B008
+    timing: ServerTiming = Depends(server_timing),  # noqa: B008
 ):
     env = endpoint.env
     jwt_validator = endpoint.sudo().validator_jwt
@@ -43,7 +143,8 @@ def get_current_user(
     if not jwt_validator:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    payload = decode_token(jwt_validator, token)
+    with timing.stage("verify"):
+        payload, user_id = verify_token(jwt_validator, token)
 
     if payload is None:
         raise HTTPException(
@@ -51,14 +152,53 @@ def get_current_user(
             detail=_("Invalid or expired token"),
         )
 
-    user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    user = env["res.users"].sudo().browse(int(user_id))
-    if not user.exists():
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    return user
+    return env["res.users"].sudo().browse(user_id)
+
+
+def current_claims(max_age=None):
+    """Build a dependency returning the :class:`Principal` of the bearer token.
+
+    Only the token signature and claims are verified, the database is not
+    queried at all.
+
+    :param max_age: opt-in freshness policy, tokens issued more than
+                    ``max_age`` seconds ago also have their user checked
+                    (once per token, see :func:`verify_token`)
+    """
+
+    def get_current_claims(
+        token: str = Depends(oauth2_scheme),
+        validator_id: int = Depends(jwt_validator_id),  # noqa: B008
+        env=Depends(odoo_env),  # noqa: B008
+        timing: ServerTiming = Depends(server_timing),  # noqa: B008
+    ) -> Principal:
+        if not validator_id:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        jwt_validator = env["auth.jwt.validator"].browse(validator_id)
+        with timing.stage("decode"):
+            payload = decode_token(jwt_validator, token)
+        if payload is None or not payload.get("sub"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=_("Invalid or expired token"),
+            )
+
+        if max_age is not None and time.time() - payload.get("iat", 0) > max_age:
+            with timing.stage("user_lookup"):
+                user_id = verify_token(jwt_validator, token)[1]
+            if not user_id:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+        return Principal(payload)
+
+    return get_current_claims
+
+
+get_current_claims = current_claims()
 
 
 @ontinet_api_router.post("/token")
@@ -66,12 +206,14 @@ def login_user(
     email: str,
     password: str,
     endpoint=Depends(fastapi_endpoint),  # noqa: B008
+    timing: ServerTiming = Depends(server_timing),  # noqa: B008
 ):
     try:
         env = endpoint.env
         user_model = env["res.users"]
 
-        user = user_model.sudo().search([("login", "=", email)], limit=1)
+        with timing.stage("user_lookup"):
+            user = user_model.sudo().search([("login", "=", email)], limit=1)
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
@@ -79,16 +221,19 @@ def login_user(
         if not jwt_validator:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        user_id = user_model._login(
-            request.db, email, password, request.httprequest.environ
-        )
+        with timing.stage("password"):
+            user_id = user_model._login(
+                env.cr.dbname,
+                email,
+                password,
+                request.httprequest.environ if request else {},
+            )
         if not user_id:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-        token = jwt_validator.generate_jwt_token(user_id, jwt_validator)
-        refresh_token = jwt_validator.generate_jwt_token(
-            user_id, endpoint.sudo().validator_jwt.next_validator_id
-        )
+        with timing.stage("encode"):
+            token = jwt_validator.generate_jwt_token(user_id, jwt_validator)
+            refresh_token = jwt_validator.generate_refresh_token(user_id)
 
         return {
             "access_token": token,
@@ -100,9 +245,33 @@ def login_user(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR) from err
 
 
+@ontinet_api_router.post("/token/batch", response_model=TokenBatchResponse)
+def login_users_batch(
+    batch: TokenBatchRequest,
+    current_user=Depends(get_current_user),  # noqa: B008
+    endpoint=Depends(fastapi_endpoint),  # noqa: B008
+    timing: ServerTiming = Depends(server_timing),  # noqa: B008
+):
+    """Issue tokens for many users at once, for administrator clients."""
+    if not current_user.has_group("base.group_system"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    jwt_validator = endpoint.sudo().validator_jwt
+    if not jwt_validator:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    with timing.stage("encode"):
+        tokens = jwt_validator.generate_jwt_tokens(batch.user_ids)
+    issued = {token["user_id"] for token in tokens}
+    return {
+        "tokens": tokens,
+        "missing_user_ids": [uid for uid in batch.user_ids if uid not in issued],
+    }
+
+
 @ontinet_api_router.get("/protected")
 def protected_route(
-    current_user: dict = Depends(get_current_user),  # noqa: B008
+    current_user: Principal = Depends(get_current_claims),  # noqa: B008
 ):
     response = {
         "message": _("You have accessed a protected route"),
@@ -116,6 +285,7 @@ def protected_route(
 def refresh_token(
     token: str = Depends(oauth2_scheme),
     endpoint=Depends(fastapi_endpoint),  # noqa: B008
+    timing: ServerTiming = Depends(server_timing),  # noqa: B008
 ):
     try:
         env = endpoint.env
@@ -124,28 +294,208 @@ def refresh_token(
         if not jwt_validator:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        payload = decode_token(jwt_validator.next_validator_id, token)
+        with timing.stage("decode"):
+            payload = decode_token(jwt_validator._get_next_validator(), token)
 
-        if payload is None:
+        if payload is None or not payload.get("jti"):
             raise HTTPException(
-                _(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid or expired token",
-                )
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=_("Invalid or expired token"),
             )
 
-        user_id = int(payload.get("sub"))
-        if not user_id:
+        # Rotation on use: the presented token is consumed in favour of a new one
+        new_jti = uuid.uuid4().hex
+        with timing.stage("user_lookup"):
+            user_id = env["fastapi.jwt.refresh.token"]._rotate(
+                payload["jti"], new_jti
+            )
+            if not user_id or str(user_id) != payload.get("sub"):
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+            user = env["res.users"].sudo().search([("id", "=", user_id)], limit=1)
+            if not user:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+        with timing.stage("encode"):
+            new_token = jwt_validator.generate_jwt_token(user_id, jwt_validator)
+            new_refresh_token = jwt_validator.generate_refresh_token(
+                user_id, new_jti
+            )
+        return {
+            "access_token": new_token,
+            "token_type": "Bearer",
+            "refresh_token": new_refresh_token,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR) from err
+
+
+def _get_signing_executor():
+    global _signing_executor
+    if _signing_executor is None:
+        with _signing_executor_lock:
+            if _signing_executor is None:
+                _signing_executor = ThreadPoolExecutor(
+                    max_workers=int(config.get("fastapi_jwt_executor_workers", 4)),
+                    thread_name_prefix="fastapi_jwt.signing",
+                )
+    return _signing_executor
+
+
+async def run_in_signing_executor(func, *args, **kwargs):
+    """Run the CPU bound ``func`` in the signing pool, keeping the current
+    context (Odoo request and environment) available to it."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_signing_executor(),
+        functools.partial(context.run, func, *args, **kwargs),
+    )
+
+
+async def sign_tokens(jwt_validator, refresh_validator, payloads):
+    """Sign the ``(payload, jti)`` of ``payloads`` in the signing pool.
+
+    The signing contexts are read here, on the request thread, so only CPU
+    work is sent to the pool.
+    """
+    return await run_in_signing_executor(
+        encode_token_pairs,
+        jwt_validator._get_jwt_context(),
+        refresh_validator._get_jwt_context(),
+        payloads,
+    )
+
+
+@ontinet_async_api_router.post("/token")
+async def login_user_async(
+    email: str,
+    password: str,
+    endpoint=Depends(fastapi_endpoint),  # noqa: B008
+    timing: ServerTiming = Depends(server_timing),  # noqa: B008
+):
+    try:
+        env = endpoint.env
+        user_model = env["res.users"]
+
+        with timing.stage("user_lookup"):
+            user = user_model.sudo().search([("login", "=", email)], limit=1)
+        if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-        user = env["res.users"].sudo().browse(user_id)
-        if not user.exists():
+        jwt_validator = endpoint.sudo().validator_jwt
+        if not jwt_validator:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # _login works on its own cursor, it can run in the signing pool
+        with timing.stage("password"):
+            user_id = await run_in_signing_executor(
+                user_model._login,
+                env.cr.dbname,
+                email,
+                password,
+                request.httprequest.environ if request else {},
+            )
+        if not user_id:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-        new_token = jwt_validator.generate_jwt_token(
-            user_id, endpoint.sudo().validator_jwt
-        )
-        return {"access_token": new_token, "token_type": "Bearer"}
+        refresh_validator, payloads = jwt_validator._prepare_jwt_tokens([user_id])
+        with timing.stage("encode"):
+            pairs = await sign_tokens(jwt_validator, refresh_validator, payloads)
+        tokens = jwt_validator._register_jwt_tokens(refresh_validator, payloads, pairs)
 
+        return {
+            "access_token": tokens[0]["access_token"],
+            "token_type": "Bearer",
+            "refresh_token": tokens[0]["refresh_token"],
+        }
+
+    except HTTPException:
+        raise
     except Exception as err:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR) from err
+
+
+@ontinet_async_api_router.post("/token/batch", response_model=TokenBatchResponse)
+async def login_users_batch_async(
+    batch: TokenBatchRequest,
+    current_user=Depends(get_current_user),  # noqa: B008
+    endpoint=Depends(fastapi_endpoint),  # noqa: B008
+    timing: ServerTiming = Depends(server_timing),  # noqa: B008
+):
+    if not current_user.has_group("base.group_system"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    jwt_validator = endpoint.sudo().validator_jwt
+    if not jwt_validator:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    refresh_validator, payloads = jwt_validator._prepare_jwt_tokens(batch.user_ids)
+    with timing.stage("encode"):
+        pairs = await sign_tokens(jwt_validator, refresh_validator, payloads)
+    tokens = jwt_validator._register_jwt_tokens(refresh_validator, payloads, pairs)
+    issued = {token["user_id"] for token in tokens}
+    return {
+        "tokens": tokens,
+        "missing_user_ids": [uid for uid in batch.user_ids if uid not in issued],
+    }
+
+
+@ontinet_async_api_router.post("/refresh")
+async def refresh_token_async(
+    token: str = Depends(oauth2_scheme),
+    endpoint=Depends(fastapi_endpoint),  # noqa: B008
+    timing: ServerTiming = Depends(server_timing),  # noqa: B008
+):
+    try:
+        env = endpoint.env
+        jwt_validator = endpoint.sudo().validator_jwt
+
+        if not jwt_validator:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        with timing.stage("decode"):
+            payload = decode_token(jwt_validator._get_next_validator(), token)
+
+        if payload is None or not payload.get("jti"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=_("Invalid or expired token"),
+            )
+
+        new_jti = uuid.uuid4().hex
+        with timing.stage("user_lookup"):
+            user_id = env["fastapi.jwt.refresh.token"]._rotate(
+                payload["jti"], new_jti
+            )
+            if not user_id or str(user_id) != payload.get("sub"):
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+            refresh_validator, payloads = jwt_validator._prepare_jwt_tokens([user_id])
+            if not payloads:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        # The new refresh token carries the id the old one was rotated to
+        payloads = [(payloads[0][0], new_jti)]
+
+        with timing.stage("encode"):
+            pairs = await sign_tokens(jwt_validator, refresh_validator, payloads)
+        tokens = jwt_validator._register_jwt_tokens(refresh_validator, payloads, pairs)
+        return {
+            "access_token": tokens[0]["access_token"],
+            "token_type": "Bearer",
+            "refresh_token": tokens[0]["refresh_token"],
+        }
+
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR) from err
+
+
+# Token verification is cheap (and cached): it keeps running in the default
+# thread pool so it is never queued behind logins.
+ontinet_async_api_router.add_api_route(
+    "/protected", protected_route, methods=["GET"]
+)
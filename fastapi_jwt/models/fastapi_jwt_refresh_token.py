@@ -0,0 +1,163 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Refresh token ids this worker already knows to be unusable, so replays are
+# rejected without reaching the database. Only tokens revoked by hand or whose
+# family was already revoked go here: a replayed rotated token must still
+# reach the reuse detection.
+_revoked_jtis = OrderedDict()
+_revoked_jtis_lock = threading.Lock()
+REVOKED_JTIS_SIZE = 10000
+
+
+def is_known_revoked(jti):
+    return jti in _revoked_jtis
+
+
+def remember_revoked(jtis):
+    with _revoked_jtis_lock:
+        for jti in jtis:
+            _revoked_jtis[jti] = True
+            _revoked_jtis.move_to_end(jti)
+        while len(_revoked_jtis) > REVOKED_JTIS_SIZE:
+            _revoked_jtis.popitem(last=False)
+
+
+class FastapiJwtRefreshToken(models.Model):
+    _name = "fastapi.jwt.refresh.token"
+    _description = "Refresh token JWT"
+    _order = "id desc"
+    _rec_name = "jti"
+
+    jti = fields.Char(required=True, readonly=True)
+    user_id = fields.Many2one(
+        "res.users", required=True, readonly=True, index=True, ondelete="cascade"
+    )
+    validator_id = fields.Many2one(
+        "auth.jwt.validator", readonly=True, ondelete="cascade"
+    )
+    expires_at = fields.Datetime(required=True, readonly=True, index=True)
+    revoked = fields.Boolean(readonly=True)
+    replaced_by = fields.Char(
+        readonly=True, help="Token que sustituyó a este al refrescar."
+    )
+
+    _sql_constraints = [
+        ("jti_unique", "UNIQUE(jti)", "El identificador del token debe ser único."),
+    ]
+
+    @api.model
+    def _register_tokens(self, validator, tokens):
+        """Store the refresh tokens just issued by ``validator``.
+
+        :param tokens: list of ``(jti, user_id)``
+        """
+        expires_at = datetime.now() + timedelta(
+            seconds=validator._get_jwt_context().token_duration
+        )
+        self.sudo().create(
+            [
+                {
+                    "jti": jti,
+                    "user_id": user_id,
+                    "validator_id": validator.id,
+                    "expires_at": expires_at,
+                }
+                for jti, user_id in tokens
+            ]
+        )
+
+    @api.model
+    def _rotate(self, jti, new_jti):
+        """Consume the refresh token ``jti`` in favour of ``new_jti``.
+
+        A single indexed ``UPDATE`` both checks and revokes the token. Using a
+        token that was already rotated is taken as a theft and revokes every
+        token of its user; that revocation is committed on its own cursor
+        since the request transaction is rolled back by the 401 that follows.
+        Token ids are only remembered as revoked once committed, and a rotated
+        token only once its family is revoked.
+
+        :return: id of the token user, False if the token is not usable
+        """
+        if is_known_revoked(jti):
+            return False
+        self.env.cr.execute(
+            SQL(
+                """
+            UPDATE %(table)s
+            SET revoked = true, replaced_by = %(new_jti)s,
+                write_date = now() at time zone 'UTC'
+            WHERE jti = %(jti)s
+                AND NOT revoked
+                AND expires_at > now() at time zone 'UTC'
+            RETURNING user_id
+        """,
+                table=SQL.identifier(self._table),
+                jti=jti,
+                new_jti=new_jti,
+            )
+        )
+        row = self.env.cr.fetchone()
+        if row:
+            return row[0]
+
+        with self.env.registry.cursor() as cr:
+            cr.execute(
+                SQL(
+                    """
+                UPDATE %(table)s
+                SET revoked = true, write_date = now() at time zone 'UTC'
+                WHERE NOT revoked AND user_id IN (
+                    SELECT user_id FROM %(table)s
+                    WHERE jti = %(jti)s AND replaced_by IS NOT NULL
+                )
+                RETURNING jti
+            """,
+                    table=SQL.identifier(self._table),
+                    jti=jti,
+                )
+            )
+            family = [token_jti for (token_jti,) in cr.fetchall()]
+        if family:
+            _logger.warning(
+                "Refresh token %s reused, %d tokens of its user revoked",
+                jti,
+                len(family),
+            )
+        remember_revoked([jti, *family])
+        return False
+
+    def action_revoke(self):
+        self.sudo().write({"revoked": True})
+        jtis = self.mapped("jti")
+        self.env.cr.postcommit.add(lambda: remember_revoked(jtis))
+        return True
+
+    @api.model
+    def revoke_user_tokens(self, user_ids):
+        tokens = self.sudo().search(
+            [("user_id", "in", user_ids), ("revoked", "=", False)]
+        )
+        return tokens.action_revoke()
+
+    @api.autovacuum
+    def _gc_expired_tokens(self):
+        self.env.cr.execute(
+            SQL(
+                "DELETE FROM %s WHERE expires_at < %s",
+                SQL.identifier(self._table),
+                datetime.now() - timedelta(days=1),
+            )
+        )
+        _logger.info("GC refresh tokens delete %d entries", self.env.cr.rowcount)
@@ -0,0 +1,20 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+from pydantic import BaseModel, Field
+
+
+class TokenBatchRequest(BaseModel):
+    user_ids: list[int] = Field(..., min_length=1, max_length=1000)
+
+
+class UserTokens(BaseModel):
+    user_id: int
+    access_token: str
+    refresh_token: str
+    token_type: str = "Bearer"
+
+
+class TokenBatchResponse(BaseModel):
+    tokens: list[UserTokens]
+    missing_user_ids: list[int] = []
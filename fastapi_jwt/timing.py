@@ -0,0 +1,51 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import time
+from contextlib import contextmanager
+
+from fastapi import Response
+
+from odoo.tools import config, str2bool
+
+
+class ServerTiming:
+    """Per-stage durations of a request, reported in a ``Server-Timing``
+    header when the ``fastapi_jwt_server_timing`` server option is set."""
+
+    __slots__ = ("response", "enabled")
+
+    def __init__(self, response, enabled):
+        self.response = response
+        self.enabled = enabled
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = f"{name};dur={(time.perf_counter() - start) * 1000:.3f}"
+            previous = self.response.headers.get("Server-Timing")
+            self.response.headers["Server-Timing"] = (
+                f"{previous}, {entry}" if previous else entry
+            )
+
+
+def server_timing(response: Response) -> ServerTiming:
+    return ServerTiming(
+        response, str2bool(str(config.get("fastapi_jwt_server_timing", False)))
+    )
+
+
+def parse_server_timing(header):
+    """Return ``{stage: milliseconds}`` from a ``Server-Timing`` header."""
+    stages = {}
+    for entry in filter(None, (header or "").split(",")):
+        name, _sep, params = entry.strip().partition(";")
+        if params.startswith("dur="):
+            stages[name] = stages.get(name, 0.0) + float(params[4:])
+    return stages
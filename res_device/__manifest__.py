@@ -8,6 +8,7 @@
     "application": False,
     "depends": [
         "base",
+        "bus",
         "web",
     ],
     "data": [
@@ -15,6 +16,7 @@
         "security/ir.model.access.csv",
         "views/res_device_views.xml",
         "views/res_users_views.xml",
+        "views/res_device_activity_views.xml",
         "data/data_cron.xml",
     ],
     "assets": {
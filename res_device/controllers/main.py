@@ -1,18 +1,38 @@
 # Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
 
+import hmac
 import logging
+from datetime import datetime, timedelta
+
+from werkzeug.exceptions import Forbidden, NotFound
 
 from odoo import http
 from odoo.http import request
+from odoo.tools import config
+
+from ..utils import metrics, user_agent
+from ..utils.cache import TTLCache, get_param
 
 _logger = logging.getLogger(__name__)
+device_updates = metrics.counter(
+    "res_device_update_device_requests_total", "Calls to /web/session/update_device."
+)
+registration_cache_hits = metrics.counter(
+    "res_device_registration_cache_hits_total",
+    "Device updates answered from the registration cache.",
+)
+
+# (database, session identifier, uid) of the devices this worker has already
+# seen registered, so repeated calls are answered without a query.
+_registered_devices = TTLCache(ttl=300)
 
 
 class ResDeviceController(http.Controller):
     @http.route("/web/session/update_device", type="json", auth="user")
     def update_device(self):
-        _logger.info(
+        device_updates.inc()
+        _logger.debug(
             "Device update requested for user ID: %s",
             request.session.uid if request.session else "No session",
         )
@@ -20,12 +40,25 @@ class ResDeviceController(http.Controller):
         if request and request.env:
             try:
                 session_timeout_minutes = int(
-                    request.env["ir.config_parameter"]
-                    .sudo()
-                    .get_param("res_device.session_timeout_minutes", default="30")
+                    get_param(
+                        request.env, "res_device.session_timeout_minutes", "30"
+                    )
+                )
+                heartbeat_interval = int(
+                    get_param(request.env, "res_device.heartbeat_interval", "300")
                 )
 
                 session_identifier = request.session.sid[:42]
+                cache_key = (request.db, session_identifier, request.session.uid)
+                if _registered_devices.get(cache_key):
+                    registration_cache_hits.inc()
+                    return {
+                        "success": True,
+                        "session_timeout_minutes": session_timeout_minutes,
+                        "heartbeat_interval": heartbeat_interval,
+                        "already_registered": True,
+                    }
+
                 existing_device = (
                     request.env["res.device.log"]
                     .sudo()
@@ -33,6 +66,12 @@ class ResDeviceController(http.Controller):
                         [
                             ("session_identifier", "=", session_identifier),
                             ("user_id", "=", request.session.uid),
+                            # Older activity is refreshed by the heartbeat
+                            (
+                                "last_activity",
+                                ">=",
+                                datetime.now() - timedelta(seconds=heartbeat_interval),
+                            ),
                         ],
                         limit=1,
                     )
@@ -40,20 +79,32 @@ class ResDeviceController(http.Controller):
 
                 if not existing_device:
                     request.env["res.device.log"]._update_device(request)
-                    _logger.info(
+                    _logger.debug(
                         "Device information updated successfully for user ID: %s",
                         request.session.uid,
                     )
                 else:
-                    _logger.info(
+                    _logger.debug(
                         "Device already registered for user ID: %s, session: %s",
                         request.session.uid,
                         session_identifier,
                     )
 
+                _registered_devices.set(
+                    cache_key,
+                    ttl=min(
+                        int(
+                            get_param(
+                                request.env, "res_device.registration_cache_ttl", "300"
+                            )
+                        ),
+                        heartbeat_interval,
+                    ),
+                )
                 return {
                     "success": True,
                     "session_timeout_minutes": session_timeout_minutes,
+                    "heartbeat_interval": heartbeat_interval,
                     "already_registered": bool(existing_device),
                 }
             except Exception as e:
@@ -62,3 +113,45 @@ class ResDeviceController(http.Controller):
 
         _logger.warning("Cannot update device: no request or environment")
         return {"success": False}
+
+    @http.route(
+        "/res_device/metrics",
+        type="http",
+        auth="none",
+        methods=["GET"],
+        save_session=False,
+    )
+    def metrics(self, token=None):
+        """Metrics of this worker in Prometheus text format.
+
+        Disabled unless ``res_device_metrics_token`` is set in the server
+        configuration; the token is given as a bearer token or ``?token=``.
+        """
+        expected = config.get("res_device_metrics_token")
+        if not expected:
+            raise NotFound()
+        authorization = request.httprequest.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            token = authorization[len("Bearer ") :]
+        if not token or not hmac.compare_digest(token, expected):
+            raise Forbidden()
+        user_agent_stats = user_agent.cache_stats()
+        body = metrics.render(
+            extra=[
+                (
+                    "res_device_user_agent_cache_hits_total",
+                    "counter",
+                    "User-Agent parses answered from the cache.",
+                    user_agent_stats["hits"],
+                ),
+                (
+                    "res_device_user_agent_cache_misses_total",
+                    "counter",
+                    "User-Agent strings parsed.",
+                    user_agent_stats["misses"],
+                ),
+            ]
+        )
+        return request.make_response(
+            body, headers=[("Content-Type", "text/plain; version=0.0.4")]
+        )
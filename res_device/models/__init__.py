@@ -1,3 +1,6 @@
 from . import res_device
 from . import http_session
 from . import res_users
+from . import res_device_activity
+from . import ir_http
+from . import ir_websocket
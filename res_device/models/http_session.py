@@ -6,53 +6,73 @@ import time
 
 from odoo.http import Session
 
+from ..utils import metrics
+from ..utils.cache import get_param
+from ..utils.user_agent import parse_user_agent
+
 _logger = logging.getLogger(__name__)
-original_init = Session.__init__
+trace_updates = metrics.counter(
+    "res_device_trace_updates_total", "Session traces updated."
+)
+trace_update_seconds = metrics.histogram(
+    "res_device_trace_update_seconds", "Time spent updating session traces."
+)
+# Fields whose change is always persisted, whatever the granularity
+TRACKED_FIELDS = ("platform", "browser", "ip_address")
 
 
-def patched_init(self, *args, **kwargs):
-    original_init(self, *args, **kwargs)
-    self.trace = {}
+def update_trace(self, request):
+    with trace_update_seconds.time():
+        trace = _update_trace(self, request)
+    if trace:
+        trace_updates.inc()
+    return trace
 
 
-def update_trace(self, request):
-    if not hasattr(self, "trace"):
-        self.trace = {}
+def _update_trace(self, request):
+    """Refresh the trace of the session, only when it is worth persisting.
 
+    The trace is replaced (which marks the session dirty) when a tracked
+    field changes or when ``last_activity`` moved by more than
+    ``res_device.trace_granularity`` seconds (60 by default); otherwise the
+    session is left untouched and ``None`` is returned.
+    """
     try:
         user_agent = request.httprequest.user_agent
-        platform = user_agent.platform or "Unknown"
-        browser = user_agent.browser or "Unknown"
+        parsed = parse_user_agent(user_agent.string, type(user_agent))
         ip_address = request.httprequest.remote_addr
 
         current_time = time.time()
-        if not self.trace:
+        trace = self.trace
+        if not trace:
             self.trace = {
-                "platform": platform,
-                "browser": browser,
+                **parsed._asdict(),
                 "ip_address": ip_address,
                 "first_activity": current_time,
                 "last_activity": current_time,
             }
-            _logger.info(
+            _logger.debug(
                 "New trace created for session %s: %s", self.sid[:10], self.trace
             )
-        else:
-            self.trace.update(
-                {
-                    "platform": platform,
-                    "browser": browser,
-                    "ip_address": ip_address,
-                    "last_activity": current_time,
-                }
-            )
-            _logger.info("Trace updated for session %s: %s", self.sid[:10], self.trace)
+            return self.trace
+
+        values = {**parsed._asdict(), "ip_address": ip_address}
+        changed = any(trace.get(field) != values[field] for field in TRACKED_FIELDS)
+        granularity = float(
+            get_param(request.env, "res_device.trace_granularity", 60)
+            if request.env
+            else 60
+        )
+        if not changed and current_time - trace["last_activity"] < granularity:
+            return None
 
+        # Assigned, not updated in place, so that the session is saved
+        self.trace = {**trace, **values, "last_activity": current_time}
+        _logger.debug("Trace updated for session %s: %s", self.sid[:10], self.trace)
         return self.trace
     except Exception as e:
         _logger.error("Error updating trace: %s", str(e))
         return None
 
 
-Session.__init__ = patched_init
 Session.update_trace = update_trace
@@ -0,0 +1,17 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+from odoo import models
+
+from ..utils.cache import get_param
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = "ir.http"
+
+    def session_info(self):
+        result = super().session_info()
+        result["res_device_websocket"] = (
+            get_param(self.env, "res_device.activity_source", "rpc") == "websocket"
+        )
+        return result
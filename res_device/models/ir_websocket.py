@@ -0,0 +1,56 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import logging
+
+from odoo import models
+from odoo.http import root
+
+from odoo.addons.bus.websocket import wsrequest
+
+from ..utils.cache import TTLCache, get_param
+
+_logger = logging.getLogger(__name__)
+
+# (database, session identifier) of the sessions whose activity this worker
+# recorded recently; later websocket events of the same session are skipped.
+_sampled_sessions = TTLCache(ttl=300)
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = "ir.websocket"
+
+    def _subscribe(self, data):
+        super()._subscribe(data)
+        self._record_device_activity()
+
+    def _update_bus_presence(self, inactivity_period, im_status_ids_by_model):
+        super()._update_bus_presence(inactivity_period, im_status_ids_by_model)
+        # Presence is sent by idle tabs too, only count recent user activity
+        interval = int(get_param(self.env, "res_device.heartbeat_interval", 300))
+        if inactivity_period < interval * 1000:
+            self._record_device_activity()
+
+    def _record_device_activity(self):
+        """Record the device of the websocket session, once per heartbeat.
+
+        Only active when ``res_device.activity_source`` is ``websocket``; the
+        web client then stops calling ``/web/session/update_device``.
+        """
+        if not wsrequest or not wsrequest.session.uid:
+            return
+        if get_param(self.env, "res_device.activity_source", "rpc") != "websocket":
+            return
+        interval = int(get_param(self.env, "res_device.heartbeat_interval", 300))
+        key = (wsrequest.db, wsrequest.session.sid[:42])
+        if _sampled_sessions.get(key):
+            return
+        _sampled_sessions.set(key, ttl=interval)
+        try:
+            with self.env.cr.savepoint():
+                self.env["res.device.log"].sudo()._update_device(wsrequest)
+            if wsrequest.session.is_dirty:
+                # Websocket messages do not save the session by themselves
+                root.session_store.save(wsrequest.session)
+        except Exception:
+            _logger.exception("Could not record the device of a websocket session")
@@ -2,14 +2,60 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
 
 import logging
-import os
+import time
 from datetime import datetime, timedelta
 
 from odoo import _, api, fields, models, tools
-from odoo.http import GeoIP, request, root
+from odoo.http import request
 from odoo.tools import SQL, OrderedSet, unique
 
+from ..utils import device_log_buffer, geoip, metrics, session_revoker, user_agent
+from ..utils.cache import get_param
+from ..utils.session_store import SESSION_TABLE
+
 _logger = logging.getLogger(__name__)
+inserted_logs = metrics.counter(
+    "res_device_log_inserted_total", "Device logs inserted."
+)
+insert_seconds = metrics.histogram(
+    "res_device_log_insert_seconds", "Time spent inserting device logs."
+)
+revoked_sessions = metrics.counter(
+    "res_device_sessions_revoked_total", "Sessions deleted from the session store."
+)
+revocation_seconds = metrics.histogram(
+    "res_device_revocation_seconds", "Time spent deleting sessions from the store."
+)
+gc_deleted_logs = metrics.counter(
+    "res_device_log_gc_deleted_total",
+    "Device logs deleted by the GC and the retention cron.",
+)
+
+UPSERT_INDEX = "res_device_log__upsert_key_idx"
+UPSERT_KEY = SQL(
+    """session_identifier, COALESCE(platform, ''),
+    COALESCE(browser, ''), COALESCE(ip_address, '')"""
+)
+# (database, registry sequence) -> whether the upsert index exists; creating
+# or dropping it invalidates the registry, which renews the sequence
+_upsert_index_states = {}
+
+LATEST_TABLE = "res_device_latest"
+# (database, registry sequence) pairs whose latest devices table exists
+_latest_ready_registries = set()
+
+PARTITIONED_TABLE = "res_device_log_partitioned"
+PARTITION_PREFIX = "res_device_log_p"
+# (database, registry sequence) pairs whose log is attached to the parent
+_partitioned_registries = set()
+
+# An active tab refreshes its last activity every 1.6-2.4 heartbeats at worst
+# (jittered heartbeat plus the registration cache), the sweeper never takes a
+# session for idle before this many heartbeats
+IDLE_SWEEP_MIN_HEARTBEATS = 2.5
+
+LINKED_IP_TABLE = "res_device_linked_ip"
+LINKED_IP_KEY = SQL("session_identifier, COALESCE(platform, ''), COALESCE(browser, '')")
 
 
 class ResDeviceLog(models.Model):
@@ -33,12 +79,22 @@ class ResDeviceLog(models.Model):
         help="""If True, the session file corresponding to this device
                                     no longer exists on the filesystem.""",
     )
+    geo_pending = fields.Boolean(
+        help="The country and city are still to be resolved by the GeoIP cron."
+    )
     is_current = fields.Boolean("Current Device", compute="_compute_is_current")
     linked_ip_addresses = fields.Text(
         "Linked IP address", compute="_compute_linked_ip_addresses"
     )
 
+    def _auto_init(self):
+        if self._is_partitioned():
+            # Columns can only be added to the parent of a partition
+            self._add_partitioned_columns()
+        return super()._auto_init()
+
     def init(self):
+        self._setup_partitioning()
         self.env.cr.execute(
             SQL(
                 """
@@ -54,6 +110,603 @@ class ResDeviceLog(models.Model):
                 SQL.identifier(self._table),
             )
         )
+        self.env.cr.execute(
+            SQL(
+                """
+            CREATE INDEX IF NOT EXISTS res_device_log__active_activity_idx
+            ON %s(last_activity)
+            WHERE revoked = False
+        """,
+                SQL.identifier(self._table),
+            )
+        )
+        self.env.cr.execute(
+            SQL(
+                """
+            CREATE INDEX IF NOT EXISTS res_device_log__geo_pending_idx
+            ON %s(ip_address)
+            WHERE geo_pending
+        """,
+                SQL.identifier(self._table),
+            )
+        )
+        if self._is_upsert_mode():
+            self._ensure_upsert_index()
+        else:
+            self._drop_upsert_index()
+        self._setup_linked_ip_addresses()
+
+    @api.model
+    def _setup_linked_ip_addresses(self):
+        """Create the table of distinct IP addresses per device if missing.
+
+        It holds one row per session, platform and browser with the IP
+        addresses seen in order; :meth:`_insert_device_logs` keeps it up to
+        date so ``linked_ip_addresses`` never has to group the log.
+        """
+        cr = self.env.cr
+        if tools.table_exists(cr, LINKED_IP_TABLE):
+            return
+        cr.execute(
+            SQL(
+                """
+            CREATE TABLE %(linked)s (
+                session_identifier varchar NOT NULL,
+                platform varchar,
+                browser varchar,
+                ip_addresses varchar[] NOT NULL
+            );
+            CREATE UNIQUE INDEX %(key_idx)s ON %(linked)s(%(key)s);
+            INSERT INTO %(linked)s
+            SELECT
+                session_identifier, platform, browser,
+                array_agg(ip_address ORDER BY first_activity)
+            FROM (
+                SELECT DISTINCT ON (%(key)s, ip_address)
+                    session_identifier, platform, browser,
+                    ip_address, first_activity
+                FROM %(table)s
+                WHERE ip_address IS NOT NULL
+                ORDER BY %(key)s, ip_address, first_activity
+            ) ips
+            GROUP BY session_identifier, platform, browser
+            ON CONFLICT DO NOTHING;
+        """,
+                linked=SQL.identifier(LINKED_IP_TABLE),
+                key_idx=SQL.identifier(f"{LINKED_IP_TABLE}__key_idx"),
+                key=LINKED_IP_KEY,
+                table=SQL.identifier(self._table),
+            )
+        )
+        _logger.info("Collected the linked IP addresses of %d devices", cr.rowcount)
+
+    def _update_linked_ip_addresses(self, env, rows):
+        """Add the IP addresses of ``rows`` to their device in a single upsert."""
+        ips_by_device = {}
+        for row in rows:
+            if row["ip_address"]:
+                key = (
+                    row["session_identifier"],
+                    row["platform"] or "",
+                    row["browser"] or "",
+                )
+                ips_by_device.setdefault(key, OrderedSet()).add(row["ip_address"])
+        if not ips_by_device:
+            return
+        env.cr.execute(
+            SQL(
+                """
+            INSERT INTO %(linked)s AS linked
+                (session_identifier, platform, browser, ip_addresses)
+            VALUES %(values)s
+            ON CONFLICT (%(key)s) DO UPDATE SET
+                ip_addresses = linked.ip_addresses || ARRAY(
+                    SELECT new.ip
+                    FROM unnest(EXCLUDED.ip_addresses) WITH ORDINALITY AS new(ip, n)
+                    WHERE new.ip <> ALL(linked.ip_addresses)
+                    ORDER BY new.n
+                )
+            WHERE NOT EXCLUDED.ip_addresses <@ linked.ip_addresses
+        """,
+                linked=SQL.identifier(LINKED_IP_TABLE),
+                key=LINKED_IP_KEY,
+                values=SQL(", ").join(
+                    SQL(
+                        "(%s, %s, %s, %s::varchar[])",
+                        session_identifier,
+                        platform or None,
+                        browser or None,
+                        list(ips),
+                    )
+                    for (session_identifier, platform, browser), ips in (
+                        ips_by_device.items()
+                    )
+                ),
+            )
+        )
+
+    @api.model
+    def _gc_linked_ip_addresses(self):
+        """Forget the devices that no longer have any log."""
+        self.env.cr.execute(
+            SQL(
+                """
+            DELETE FROM %(linked)s linked
+            WHERE NOT EXISTS (
+                SELECT 1 FROM %(table)s log
+                WHERE log.session_identifier = linked.session_identifier
+            )
+        """,
+                linked=SQL.identifier(LINKED_IP_TABLE),
+                table=SQL.identifier(self._log_table()),
+            )
+        )
+        _logger.info("GC linked IP addresses delete %d devices", self.env.cr.rowcount)
+
+    def _is_upsert_mode(self):
+        return tools.str2bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("res_device.log_upsert", "False")
+        )
+
+    def _has_upsert_index(self):
+        key = self._latest_registry_key()
+        exists = _upsert_index_states.get(key)
+        if exists is None:
+            exists = tools.index_exists(self.env.cr, UPSERT_INDEX)
+            _upsert_index_states[key] = exists
+        return exists
+
+    def _drop_upsert_index(self):
+        """Drop the upsert index once the upsert mode is switched off.
+
+        Plain inserts would otherwise fail on every repeated device. The
+        registry is invalidated so that the other workers stop using
+        ``ON CONFLICT`` on it.
+        """
+        if not tools.index_exists(self.env.cr, UPSERT_INDEX):
+            return
+        self.env.cr.execute(SQL("DROP INDEX %s", SQL.identifier(UPSERT_INDEX)))
+        _upsert_index_states[self._latest_registry_key()] = False
+        self.env.registry.registry_invalidated = True
+        _logger.info("Dropped %s, device log upserts are disabled", UPSERT_INDEX)
+
+    def _ensure_upsert_index(self):
+        """Collapse the log to one row per upsert key and create its unique index.
+
+        The index is what ``INSERT ... ON CONFLICT`` relies on; it is built on
+        the same key the GC uses, with NULLs folded so that they conflict too.
+        """
+        if self._has_upsert_index():
+            return
+        self.env.cr.execute(
+            SQL(
+                """
+            DELETE FROM %(table)s log1
+            USING %(table)s log2
+            WHERE
+                log1.session_identifier = log2.session_identifier
+                AND COALESCE(log1.platform, '') = COALESCE(log2.platform, '')
+                AND COALESCE(log1.browser, '') = COALESCE(log2.browser, '')
+                AND COALESCE(log1.ip_address, '') = COALESCE(log2.ip_address, '')
+                AND (log1.last_activity, log1.id) < (log2.last_activity, log2.id)
+        """,
+                table=SQL.identifier(self._table),
+            )
+        )
+        _logger.info(
+            "Collapsed %d duplicated device logs before enabling upserts",
+            self.env.cr.rowcount,
+        )
+        self.env.cr.execute(
+            SQL(
+                """
+            CREATE UNIQUE INDEX IF NOT EXISTS %s
+            ON %s(%s)
+        """,
+                SQL.identifier(UPSERT_INDEX),
+                SQL.identifier(self._table),
+                UPSERT_KEY,
+            )
+        )
+        _upsert_index_states[self._latest_registry_key()] = True
+        # Let every worker switch to ON CONFLICT inserts
+        self.env.registry.registry_invalidated = True
+
+    def _is_partitioned(self):
+        """Whether the log is the default partition of :data:`PARTITIONED_TABLE`."""
+        key = self._latest_registry_key()
+        if key not in _partitioned_registries:
+            self.env.cr.execute(
+                SQL(
+                    """
+                SELECT 1 FROM pg_inherits
+                WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)
+            """,
+                    self._table,
+                    PARTITIONED_TABLE,
+                )
+            )
+            if not self.env.cr.rowcount:
+                return False
+            _partitioned_registries.add(key)
+        return True
+
+    def _log_table(self):
+        """Name of the table holding the whole log, older partitions included.
+
+        The ORM only sees the hot partition, readers of the full history must
+        go through this table.
+        """
+        log = self.env["res.device.log"]
+        return PARTITIONED_TABLE if log._is_partitioned() else log._table
+
+    def _add_partitioned_columns(self):
+        columns = tools.table_columns(self.env.cr, PARTITIONED_TABLE)
+        for name, field in self._fields.items():
+            if not field.store or not field.column_type or name in columns:
+                continue
+            self.env.cr.execute(
+                SQL(
+                    "ALTER TABLE %s ADD COLUMN %s %s",
+                    SQL.identifier(PARTITIONED_TABLE),
+                    SQL.identifier(name),
+                    SQL(field.column_type[1]),
+                )
+            )
+
+    @api.model
+    def _setup_partitioning(self):
+        """Attach or detach the log to its range partitioned parent.
+
+        The ORM keeps working on ``res_device_log``, which becomes the DEFAULT
+        partition of a parent partitioned by ``last_activity``: it only holds
+        the recent (hot) rows, older days are moved to their own partition by
+        :meth:`_cron_maintain_log_partitions` and dropped once expired. The
+        devices view and the crons read the parent, see :meth:`_log_table`.
+        """
+        cr = self.env.cr
+        enabled = tools.str2bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("res_device.log_partitioned", "False")
+        )
+        partitioned = self._is_partitioned()
+        _partitioned_registries.discard(self._latest_registry_key())
+        if enabled and not partitioned:
+            cr.execute(SQL("SELECT to_regclass(%s)", PARTITIONED_TABLE))
+            if cr.fetchone()[0]:
+                # Left by a previous deactivation, with its old partitions
+                self._add_partitioned_columns()
+            else:
+                cr.execute(
+                    SQL(
+                        """
+                    CREATE TABLE %(parent)s (LIKE %(table)s INCLUDING DEFAULTS)
+                    PARTITION BY RANGE (last_activity)
+                """,
+                        parent=SQL.identifier(PARTITIONED_TABLE),
+                        table=SQL.identifier(self._table),
+                    )
+                )
+            cr.execute(
+                SQL(
+                    "ALTER TABLE %s ATTACH PARTITION %s DEFAULT",
+                    SQL.identifier(PARTITIONED_TABLE),
+                    SQL.identifier(self._table),
+                )
+            )
+            _logger.info("Attached %s to %s", self._table, PARTITIONED_TABLE)
+        elif partitioned and not enabled:
+            cr.execute(
+                SQL(
+                    "ALTER TABLE %s DETACH PARTITION %s",
+                    SQL.identifier(PARTITIONED_TABLE),
+                    SQL.identifier(self._table),
+                )
+            )
+            _logger.warning(
+                "Detached %s from %s, the older partitions are kept there",
+                self._table,
+                PARTITIONED_TABLE,
+            )
+
+    def _list_log_partitions(self):
+        """Return the ``(date, name)`` of the daily partitions, oldest first."""
+        self.env.cr.execute(
+            SQL(
+                """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s) AND c.relname LIKE %s
+        """,
+                PARTITIONED_TABLE,
+                f"{PARTITION_PREFIX}%",
+            )
+        )
+        partitions = []
+        for (name,) in self.env.cr.fetchall():
+            try:
+                day = datetime.strptime(name[len(PARTITION_PREFIX) :], "%Y%m%d")
+            except ValueError:
+                continue
+            partitions.append((day, name))
+        return sorted(partitions)
+
+    def _move_day_to_partition(self, day):
+        """Move the rows of ``day`` from the hot log to their own partition.
+
+        A ``CHECK`` matching the bounds is added before attaching so that
+        Postgres does not need to scan the new partition to validate it. It
+        still scans the DEFAULT partition under an ``ACCESS EXCLUSIVE`` lock to
+        check that no row belongs to the new range, which blocks the log
+        inserts for the time of one pass over the hot rows. The latest devices
+        of the moved sessions are recomputed once attached.
+
+        :return: number of moved rows
+        """
+        cr = self.env.cr
+        start = datetime(day.year, day.month, day.day)
+        end = start + timedelta(days=1)
+        partition = f"{PARTITION_PREFIX}{start:%Y%m%d}"
+        columns = SQL(", ").join(
+            SQL.identifier(column)
+            for column in tools.table_columns(cr, PARTITIONED_TABLE)
+        )
+        cr.execute(
+            SQL(
+                """
+            CREATE TABLE %(partition)s (LIKE %(parent)s INCLUDING DEFAULTS);
+            WITH moved AS (
+                DELETE FROM %(table)s
+                WHERE last_activity >= %(start)s AND last_activity < %(end)s
+                RETURNING %(columns)s
+            ), inserted AS (
+                INSERT INTO %(partition)s (%(columns)s) SELECT %(columns)s FROM moved
+            )
+            SELECT count(*), array_agg(DISTINCT session_identifier) FROM moved
+        """,
+                partition=SQL.identifier(partition),
+                parent=SQL.identifier(PARTITIONED_TABLE),
+                table=SQL.identifier(self._table),
+                columns=columns,
+                start=start,
+                end=end,
+            )
+        )
+        moved, session_identifiers = cr.fetchone()
+        cr.execute(
+            SQL(
+                """
+            ALTER TABLE %(partition)s ADD CONSTRAINT %(bounds)s CHECK (
+                last_activity IS NOT NULL
+                AND last_activity >= %(start)s AND last_activity < %(end)s
+            );
+            CREATE INDEX %(session_idx)s ON %(partition)s(session_identifier);
+            CREATE INDEX %(user_idx)s ON %(partition)s(user_id);
+            CREATE INDEX %(activity_idx)s ON %(partition)s(last_activity);
+            CREATE INDEX %(geo_idx)s ON %(partition)s(ip_address) WHERE geo_pending;
+            ALTER TABLE %(parent)s ATTACH PARTITION %(partition)s
+                FOR VALUES FROM (%(start)s) TO (%(end)s);
+            ALTER TABLE %(partition)s DROP CONSTRAINT %(bounds)s;
+        """,
+                partition=SQL.identifier(partition),
+                parent=SQL.identifier(PARTITIONED_TABLE),
+                bounds=SQL.identifier(f"{partition}_bounds"),
+                session_idx=SQL.identifier(f"{partition}__session_identifier_idx"),
+                user_idx=SQL.identifier(f"{partition}__user_id_idx"),
+                activity_idx=SQL.identifier(f"{partition}__last_activity_idx"),
+                geo_idx=SQL.identifier(f"{partition}__geo_pending_idx"),
+                start=start,
+                end=end,
+            )
+        )
+        self._refresh_latest_devices(session_identifiers)
+        return moved
+
+    def _drop_expired_partitions(self, cutoff):
+        """Drop the daily partitions that only hold rows older than ``cutoff``.
+
+        :return: number of dropped partitions
+        """
+        dropped = 0
+        for day, name in self._list_log_partitions():
+            if day + timedelta(days=1) > cutoff:
+                break
+            self.env.cr.execute(SQL("DROP TABLE %s", SQL.identifier(name)))
+            dropped += 1
+        if dropped:
+            _logger.info("Dropped %d expired device log partitions", dropped)
+        return dropped
+
+    @api.model
+    def _cron_maintain_log_partitions(self):
+        """Move the finished days out of the hot log and drop expired days.
+
+        ``res_device.log_partition_hot_days`` days (1 by default) stay in the
+        hot partition; each older day is moved and committed on its own.
+
+        :return: dict with the number of ``moved`` rows, ``partitions``
+                 created and ``dropped``
+        """
+        counts = {"moved": 0, "partitions": 0, "dropped": 0}
+        if not self._is_partitioned():
+            return counts
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        hot_days = int(get_param("res_device.log_partition_hot_days", 1))
+        retention = float(get_param("res_device.log_retention_hours", 2))
+
+        today = fields.Date.today()
+        boundary = datetime(today.year, today.month, today.day) - timedelta(
+            days=hot_days
+        )
+        after = None
+        while True:
+            self.env.cr.execute(
+                SQL(
+                    """
+                SELECT min(last_activity) FROM %(table)s
+                WHERE last_activity < %(boundary)s
+                    AND (%(after)s::timestamp IS NULL OR last_activity >= %(after)s)
+            """,
+                    table=SQL.identifier(self._table),
+                    boundary=boundary,
+                    after=after,
+                )
+            )
+            oldest = self.env.cr.fetchone()[0]
+            if not oldest:
+                break
+            after = datetime(oldest.year, oldest.month, oldest.day) + timedelta(days=1)
+            counts["moved"] += self._move_day_to_partition(oldest.date())
+            counts["partitions"] += 1
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+
+        counts["dropped"] = self._drop_expired_partitions(
+            datetime.now() - timedelta(hours=retention)
+        )
+        self.invalidate_model()
+        _logger.info(
+            "Maintained device log partitions: %(moved)d rows moved to "
+            "%(partitions)d partitions, %(dropped)d partitions dropped",
+            counts,
+        )
+        return counts
+
+    def _latest_registry_key(self):
+        return (self.env.cr.dbname, self.env.registry.registry_sequence)
+
+    def _use_latest_table(self):
+        """Whether ``res.device`` is served from the materialized latest table.
+
+        The view is only rebuilt on module update, so this follows the table
+        it reads rather than ``res_device.device_materialized``: the table is
+        kept up to date for as long as it exists.
+        """
+        key = self._latest_registry_key()
+        if key not in _latest_ready_registries:
+            if not tools.table_exists(self.env.cr, LATEST_TABLE):
+                return False
+            _latest_ready_registries.add(key)
+        return True
+
+    @api.model
+    def _setup_latest_devices(self):
+        """(Re)create the latest devices table according to the configuration.
+
+        The table has the same columns as the log and holds exactly the rows
+        the ``res.device`` anti-join would return.
+        """
+        _latest_ready_registries.discard(self._latest_registry_key())
+        cr = self.env.cr
+        cr.execute(SQL("DROP TABLE IF EXISTS %s", SQL.identifier(LATEST_TABLE)))
+        if not tools.str2bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("res_device.device_materialized", "False")
+        ):
+            return
+        cr.execute(
+            SQL(
+                """
+            CREATE TABLE %(latest)s (LIKE %(table)s INCLUDING DEFAULTS);
+            CREATE UNIQUE INDEX %(id_idx)s ON %(latest)s(id);
+            CREATE INDEX %(user_idx)s ON %(latest)s(user_id);
+            CREATE INDEX %(session_idx)s ON %(latest)s(session_identifier);
+            CREATE INDEX %(activity_idx)s ON %(latest)s(last_activity);
+            INSERT INTO %(latest)s %(live)s;
+        """,
+                latest=SQL.identifier(LATEST_TABLE),
+                table=SQL.identifier(self._table),
+                id_idx=SQL.identifier(f"{LATEST_TABLE}__id_idx"),
+                user_idx=SQL.identifier(f"{LATEST_TABLE}__user_id_idx"),
+                session_idx=SQL.identifier(f"{LATEST_TABLE}__session_identifier_idx"),
+                activity_idx=SQL.identifier(f"{LATEST_TABLE}__last_activity_idx"),
+                live=SQL(self.env["res.device"]._live_query),
+            )
+        )
+        _logger.info("Materialized %d devices in %s", cr.rowcount, LATEST_TABLE)
+        _latest_ready_registries.add(self._latest_registry_key())
+
+    @api.model
+    def _refresh_latest_devices(self, session_identifiers):
+        """Recompute the latest devices of the given sessions only."""
+        if not session_identifiers or not self._use_latest_table():
+            return
+        session_identifiers = list(session_identifiers)
+        self.env.cr.execute(
+            SQL(
+                """
+            DELETE FROM %(latest)s WHERE session_identifier = ANY(%(sids)s);
+            INSERT INTO %(latest)s %(live)s AND D.session_identifier = ANY(%(sids)s)
+            ON CONFLICT (id) DO NOTHING;
+        """,
+                latest=SQL.identifier(LATEST_TABLE),
+                live=SQL(self.env["res.device"]._live_query),
+                sids=session_identifiers,
+            )
+        )
+
+    @api.model
+    def _check_latest_devices(self, repair=False):
+        """Compare the latest devices table with the log it is derived from.
+
+        :param repair: rebuild the table when it is found inconsistent
+        :return: number of ``missing`` and ``stale`` rows in the table
+        """
+        if not self._use_latest_table():
+            return {}
+        live = SQL(self.env["res.device"]._live_query)
+        latest = SQL.identifier(LATEST_TABLE)
+        self.env.cr.execute(
+            SQL(
+                """
+            SELECT
+                (SELECT count(*) FROM (%(live)s EXCEPT SELECT * FROM %(latest)s) m),
+                (SELECT count(*) FROM (SELECT * FROM %(latest)s EXCEPT %(live)s) s)
+        """,
+                live=live,
+                latest=latest,
+            )
+        )
+        missing, stale = self.env.cr.fetchone()
+        if missing or stale:
+            _logger.warning(
+                "Latest devices table is inconsistent: %d missing, %d stale rows",
+                missing,
+                stale,
+            )
+            if repair:
+                self._rebuild_latest_devices()
+        return {"missing": missing, "stale": stale}
+
+    @api.model
+    def _rebuild_latest_devices(self):
+        """Rebuild ``res.device`` (view and latest table) from scratch."""
+        self.env["res.device"].init()
+
+    def write(self, vals):
+        res = super().write(vals)
+        if ("revoked" in vals or "last_activity" in vals) and self.env[
+            "res.device.log"
+        ]._use_latest_table():
+            self.env["res.device.log"]._refresh_latest_devices(
+                set(self.mapped("session_identifier"))
+            )
+        return res
+
+    def unlink(self):
+        session_identifiers = (
+            set(self.mapped("session_identifier"))
+            if self.env["res.device.log"]._use_latest_table()
+            else set()
+        )
+        res = super().unlink()
+        self.env["res.device.log"]._refresh_latest_devices(session_identifiers)
+        return res
 
     def _compute_display_name(self):
         for device in self:
@@ -68,19 +721,32 @@ class ResDeviceLog(models.Model):
             )
 
     def _compute_linked_ip_addresses(self):
-        device_group_map = {}
-        for *device_info, ip_array in self.env["res.device.log"]._read_group(
-            domain=[("session_identifier", "in", self.mapped("session_identifier"))],
-            groupby=["session_identifier", "platform", "browser"],
-            aggregates=["ip_address:array_agg"],
-        ):
-            device_group_map[tuple(device_info)] = ip_array
+        self.env.cr.execute(
+            SQL(
+                """
+            SELECT session_identifier, platform, browser, ip_addresses
+            FROM %s
+            WHERE session_identifier = ANY(%s)
+        """,
+                SQL.identifier(LINKED_IP_TABLE),
+                list(set(self.mapped("session_identifier"))),
+            )
+        )
+        device_group_map = {
+            (session_identifier, platform or "", browser or ""): ip_addresses
+            for session_identifier, platform, browser, ip_addresses in (
+                self.env.cr.fetchall()
+            )
+        }
         for device in self:
             device.linked_ip_addresses = "\n".join(
-                OrderedSet(
-                    device_group_map.get(
-                        (device.session_identifier, device.platform, device.browser), []
-                    )
+                device_group_map.get(
+                    (
+                        device.session_identifier,
+                        device.platform or "",
+                        device.browser or "",
+                    ),
+                    [],
                 )
             )
 
@@ -90,18 +756,7 @@ class ResDeviceLog(models.Model):
         return super()._order_field_to_sql(alias, field_name, direction, nulls, query)
 
     def _is_mobile(self, platform):
-        if not platform:
-            return False
-        mobile_platform = [
-            "android",
-            "iphone",
-            "ipad",
-            "ipod",
-            "blackberry",
-            "windows phone",
-            "webos",
-        ]
-        return platform.lower() in mobile_platform
+        return user_agent.device_type(platform) == "mobile"
 
     @api.model
     def _update_device(self, request):
@@ -115,9 +770,19 @@ class ResDeviceLog(models.Model):
         if not trace:
             return
 
-        geoip = GeoIP(trace["ip_address"])
         user_id = request.session.uid
         session_identifier = request.session.sid[:42]
+        row = self._prepare_device_log_row(session_identifier, trace, user_id)
+
+        env = self.env
+        if get_param(env, "res_device.log_durability", "sync") == "async":
+            device_log_buffer.enqueue(
+                env.cr.dbname,
+                row,
+                max_size=int(get_param(env, "res_device.log_buffer_size", 500)),
+                max_delay=float(get_param(env, "res_device.log_buffer_delay", 10)),
+            )
+            return
 
         is_readonly = False
         try:
@@ -129,12 +794,73 @@ class ResDeviceLog(models.Model):
             self.env.cr.rollback()
             with self.env.registry.cursor() as cr:
                 env = api.Environment(cr, user_id, self.env.context)
-                self._insert_device_log(env, session_identifier, trace, geoip, user_id)
+                self._insert_device_logs(env, [row])
         else:
-            self._insert_device_log(self.env, session_identifier, trace, geoip, user_id)
+            self._insert_device_logs(self.env, [row])
+
+    @api.model
+    def _prepare_device_log_row(self, session_identifier, trace, user_id):
+        return {
+            "session_identifier": session_identifier,
+            "platform": trace["platform"],
+            "browser": trace["browser"],
+            "ip_address": trace["ip_address"],
+            "device_type": trace.get("device_type")
+            or user_agent.device_type(trace["platform"]),
+            "user_id": user_id,
+            "first_activity": datetime.fromtimestamp(trace["first_activity"]),
+            "last_activity": datetime.fromtimestamp(trace["last_activity"]),
+        }
 
-    def _insert_device_log(self, env, session_identifier, trace, geoip, user_id):
-        """Helper method to insert the device log record"""
+    def _insert_device_logs(self, env, rows):
+        """Insert the given device log rows with a single multi-row INSERT"""
+        if not rows:
+            return
+        with insert_seconds.time():
+            self._insert_device_log_rows(env, rows)
+        inserted_logs.inc(len(rows))
+        _logger.debug("Inserted %d device logs", len(rows))
+
+    def _insert_device_log_rows(self, env, rows):
+        # Whatever the mode, inserts must not conflict with an existing index
+        upsert = self._has_upsert_index()
+        if upsert:
+            # A single statement cannot update the same conflicting row twice
+            merged = {}
+            for row in rows:
+                key = device_log_buffer.row_key(row)
+                if key in merged:
+                    row = device_log_buffer.merge_rows(merged[key], row)
+                merged[key] = row
+            rows = list(merged.values())
+        # In deferred mode only the locations already known are filled in,
+        # the others are left to the GeoIP cron
+        deferred = get_param(env, "res_device.geoip_mode", "sync") == "deferred"
+        values = []
+        for row in rows:
+            ip_address = row["ip_address"]
+            if deferred:
+                location = geoip.cached(ip_address)
+            else:
+                location = geoip.lookup(ip_address)
+            country, city = location or (None, None)
+            values.append(
+                SQL(
+                    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                    row["session_identifier"],
+                    row["platform"],
+                    row["browser"],
+                    ip_address,
+                    country,
+                    city,
+                    row["device_type"],
+                    row["user_id"],
+                    row["first_activity"],
+                    row["last_activity"],
+                    False,
+                    location is None,
+                )
+            )
         env.cr.execute(
             SQL(
                 """
@@ -142,37 +868,169 @@ class ResDeviceLog(models.Model):
             (session_identifier, platform,
             browser, ip_address, country,
             city, device_type, user_id,
-            first_activity, last_activity, revoked)
-            VALUES (%(session_identifier)s, %(platform)s,
-            %(browser)s, %(ip_address)s, %(country)s,
-            %(city)s, %(device_type)s, %(user_id)s,
-            %(first_activity)s, %(last_activity)s, %(revoked)s)
+            first_activity, last_activity, revoked, geo_pending)
+            VALUES %s
+            %s
         """,
-                session_identifier=session_identifier,
-                platform=trace["platform"],
-                browser=trace["browser"],
-                ip_address=trace["ip_address"],
-                country=geoip.get("country_name"),
-                city=geoip.get("city"),
-                device_type="mobile"
-                if self._is_mobile(trace["platform"])
-                else "computer",
-                user_id=user_id,
-                first_activity=datetime.fromtimestamp(trace["first_activity"]),
-                last_activity=datetime.fromtimestamp(trace["last_activity"]),
-                revoked=False,
+                SQL(", ").join(values),
+                SQL(
+                    """
+            ON CONFLICT (%s) DO UPDATE SET
+                last_activity = GREATEST(
+                    res_device_log.last_activity, EXCLUDED.last_activity
+                ),
+                first_activity = LEAST(
+                    res_device_log.first_activity, EXCLUDED.first_activity
+                ),
+                user_id = EXCLUDED.user_id,
+                device_type = EXCLUDED.device_type,
+                country = COALESCE(EXCLUDED.country, res_device_log.country),
+                city = COALESCE(EXCLUDED.city, res_device_log.city),
+                revoked = EXCLUDED.revoked,
+                geo_pending = res_device_log.geo_pending AND EXCLUDED.geo_pending
+        """,
+                    UPSERT_KEY,
+                )
+                if upsert
+                else SQL(),
             )
         )
-        _logger.info("User %d inserts device log (%s)", user_id, session_identifier)
+        self._update_linked_ip_addresses(env, rows)
+        env["res.device.log"]._refresh_latest_devices(
+            {row["session_identifier"] for row in rows}
+        )
 
     @api.model
     def _delete_old_logs(self):
-        two_hours_ago = datetime.now() - timedelta(hours=2)
-        old_logs = self.env["res.device.log"].search(
-            [("last_activity", "<", two_hours_ago)]
+        """Delete the logs older than the retention period in bounded chunks.
+
+        Each chunk is picked through the ``last_activity`` index, deleted with
+        plain SQL and committed, so locks stay short and memory flat. The run
+        stops once its time budget is spent; the next one carries on.
+
+        When the log is partitioned, the daily partitions older than the
+        retention period are dropped first.
+
+        :return: dict with the number of ``deleted`` rows, ``rows_per_sec``
+                 and ``dropped`` partitions
+        """
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        retention = float(get_param("res_device.log_retention_hours", 2))
+        batch_size = int(get_param("res_device.log_retention_batch_size", 5000))
+        time_budget = float(get_param("res_device.log_retention_time_budget", 300))
+
+        cutoff = datetime.now() - timedelta(hours=retention)
+        use_latest_table = self._use_latest_table()
+        start = time.monotonic()
+        table = self._log_table()
+        dropped = 0
+        if self._is_partitioned():
+            # Whole expired days go away with their partition, the chunks
+            # below only trim the partially expired ones
+            dropped = self._drop_expired_partitions(cutoff)
+        deleted = 0
+        while time.monotonic() - start < time_budget:
+            self.env.cr.execute(
+                SQL(
+                    """
+                DELETE FROM %(table)s
+                WHERE last_activity < %(cutoff)s AND id IN (
+                    SELECT id FROM %(table)s
+                    WHERE last_activity < %(cutoff)s
+                    ORDER BY last_activity
+                    LIMIT %(limit)s
+                )
+                RETURNING session_identifier
+            """,
+                    table=SQL.identifier(table),
+                    cutoff=cutoff,
+                    limit=batch_size,
+                )
+            )
+            chunk = self.env.cr.rowcount
+            session_identifiers = {row[0] for row in self.env.cr.fetchall()}
+            deleted += chunk
+            gc_deleted_logs.inc(chunk)
+            if use_latest_table:
+                self._refresh_latest_devices(session_identifiers)
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            if chunk < batch_size:
+                break
+        self.invalidate_model()
+
+        elapsed = time.monotonic() - start
+        rows_per_sec = deleted / elapsed if elapsed else 0.0
+        _logger.info(
+            "Deleted %d device logs older than %s in %.2fs (%.0f rows/s)",
+            deleted,
+            cutoff,
+            elapsed,
+            rows_per_sec,
+        )
+        return {"deleted": deleted, "rows_per_sec": rows_per_sec, "dropped": dropped}
+
+    @api.model
+    def _cron_resolve_geoip(self):
+        """Fill the country and city of the logs inserted in deferred mode.
+
+        Each distinct pending IP address is resolved once and all its logs
+        are updated with a single ``UPDATE`` per batch of
+        ``res_device.geoip_batch_size`` addresses (1000 by default).
+
+        :return: number of updated logs
+        """
+        batch_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("res_device.geoip_batch_size", 1000)
         )
-        old_logs.unlink()
-        _logger.info("Deleted %d old device logs", len(old_logs))
+        table = SQL.identifier(self._log_table())
+        updated = 0
+        while True:
+            self.env.cr.execute(
+                SQL(
+                    """
+                SELECT DISTINCT ip_address FROM %(table)s
+                WHERE geo_pending
+                LIMIT %(limit)s
+            """,
+                    table=table,
+                    limit=batch_size,
+                )
+            )
+            ip_addresses = [row[0] for row in self.env.cr.fetchall()]
+            if not ip_addresses:
+                break
+            self.env.cr.execute(
+                SQL(
+                    """
+                UPDATE %(table)s log
+                SET country = loc.country, city = loc.city, geo_pending = false
+                FROM (VALUES %(locations)s) AS loc(ip_address, country, city)
+                WHERE log.geo_pending AND log.ip_address = loc.ip_address
+                RETURNING log.session_identifier
+            """,
+                    table=table,
+                    locations=SQL(", ").join(
+                        SQL(
+                            "(%s, %s::varchar, %s::varchar)",
+                            ip_address,
+                            *geoip.lookup(ip_address),
+                        )
+                        for ip_address in ip_addresses
+                    ),
+                )
+            )
+            updated += self.env.cr.rowcount
+            self._refresh_latest_devices({row[0] for row in self.env.cr.fetchall()})
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            if len(ip_addresses) < batch_size:
+                break
+        self.invalidate_model(["country", "city", "geo_pending"])
+        _logger.info("Resolved the location of %d device logs", updated)
+        return updated
 
     def delete_log(self):
         for record in self:
@@ -210,21 +1068,31 @@ class ResDeviceLog(models.Model):
                 ),
             }
 
-        device_logs = self.search([("user_id", "=", user_id), ("revoked", "=", False)])
+        self.env.cr.execute(
+            SQL(
+                """
+            SELECT DISTINCT session_identifier FROM %(table)s
+            WHERE user_id = %(user_id)s AND NOT revoked
+        """,
+                table=SQL.identifier(self._log_table()),
+                user_id=user_id,
+            )
+        )
+        session_identifiers = [row[0] for row in self.env.cr.fetchall()]
 
-        if not device_logs:
+        if not session_identifiers:
             return {
                 "success": True,
                 "message": _("No se encontraron sesiones activas para el usuario."),
             }
 
-        session_identifiers = list(
-            unique(device.session_identifier for device in device_logs)
-        )
-
         try:
-            self.delete_from_identifiers(session_identifiers)
-            device_logs.write({"revoked": True})
+            if (
+                session_revoker.delete_user_sessions(self.env.cr.dbname, [user_id])
+                is None
+            ):
+                self.delete_from_identifiers(session_identifiers)
+            self._revoke_logs(session_identifiers)
 
             _logger.info(
                 "Deleted %d sessions for user ID %d", len(session_identifiers), user_id
@@ -246,33 +1114,199 @@ class ResDeviceLog(models.Model):
                 "message": _("Error al borrar las sesiones: %s") % str(e),
             }
 
-    def delete_from_identifiers(self, identifiers):
-        session_path = "/opt/odoo/data/sessions/"
-        _logger.info("Using session path: %s", session_path)
+    @api.model
+    def _cron_delete_all_user_sessions(self):
+        """Revoke every active session of the internal users that have the
+        automatic logout enabled.
 
-        if not os.path.exists(session_path):
-            _logger.warning(
-                "Session path %s does not exist, skipping deletion", session_path
+        Affected users and sessions are computed with a single query, the
+        sessions are deleted in one session store pass and the logs revoked
+        with a single ``UPDATE``.
+
+        :return: dict with the ``users``, ``sessions``, ``deleted`` and
+                 ``revoked`` counts
+        """
+        self.env.cr.execute(
+            SQL(
+                """
+            SELECT log.user_id, array_agg(DISTINCT log.session_identifier)
+            FROM %(table)s log
+            JOIN res_users u ON u.id = log.user_id
+            WHERE NOT log.revoked
+                AND u.custom_field
+                AND u.active
+                AND NOT u.share
+            GROUP BY log.user_id
+        """,
+                table=SQL.identifier(self._log_table()),
             )
-            return
+        )
+        sessions_by_user = dict(self.env.cr.fetchall())
+        counts = {
+            "users": len(sessions_by_user),
+            "sessions": 0,
+            "deleted": 0,
+            "revoked": 0,
+        }
+        if not sessions_by_user:
+            _logger.info("No active sessions to close")
+            return counts
 
-        files_to_unlink = []
-        for identifier in identifiers:
-            normalized_path = os.path.normpath(
-                os.path.join(session_path, identifier[:2], identifier)
+        session_identifiers = list(
+            unique(
+                identifier
+                for identifiers in sessions_by_user.values()
+                for identifier in identifiers
             )
-            _logger.info("Looking for session files in path: %s", normalized_path)
+        )
+        counts["sessions"] = len(session_identifiers)
+        deleted = session_revoker.delete_user_sessions(
+            self.env.cr.dbname, list(sessions_by_user)
+        )
+        if deleted is None:
+            deleted = self.delete_from_identifiers(session_identifiers)
+        counts["deleted"] = deleted or 0
 
-            try:
-                os.unlink(normalized_path)
-                _logger.info("Successfully deleted session file: %s", normalized_path)
-            except OSError as e:
-                _logger.error("Error deleting file %s: %s", normalized_path, str(e))
+        self.env.cr.execute(
+            SQL(
+                """
+            UPDATE %(table)s
+            SET revoked = true
+            WHERE NOT revoked AND user_id = ANY(%(user_ids)s)
+        """,
+                table=SQL.identifier(self._log_table()),
+                user_ids=list(sessions_by_user),
+            )
+        )
+        counts["revoked"] = self.env.cr.rowcount
+        self.invalidate_model(["revoked"])
+        self._refresh_latest_devices(session_identifiers)
+
+        _logger.info(
+            "Closed the sessions of %(users)d users: %(sessions)d sessions, "
+            "%(deleted)d deleted from the store, %(revoked)d logs revoked",
+            counts,
+        )
+        return counts
 
-        _logger.info("Deleted %d session files from identifiers", len(files_to_unlink))
+    @api.model
+    def _cron_sweep_idle_sessions(self):
+        """Revoke the sessions idle for more than the session timeout.
+
+        Only the sessions of the internal users with the automatic logout
+        enabled are swept. Idle sessions are found through the index on the
+        ``last_activity`` of the active logs, then deleted from the session
+        store and revoked in batches of ``res_device.idle_sweep_batch_size``
+        (1000 by default), each one committed, until
+        ``res_device.idle_sweep_time_budget`` seconds (50 by default) are spent.
+
+        The timeout is raised to :data:`IDLE_SWEEP_MIN_HEARTBEATS` times
+        ``res_device.heartbeat_interval``, below that open tabs look idle.
+
+        :return: dict with the number of ``sessions``, ``deleted`` from the
+                 store and ``revoked`` logs
+        """
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        timeout = int(get_param("res_device.session_timeout_minutes", 30))
+        heartbeat_interval = int(get_param("res_device.heartbeat_interval", 300))
+        batch_size = int(get_param("res_device.idle_sweep_batch_size", 1000))
+        time_budget = float(get_param("res_device.idle_sweep_time_budget", 50))
+
+        cutoff = datetime.now() - max(
+            timedelta(minutes=timeout),
+            timedelta(seconds=heartbeat_interval * IDLE_SWEEP_MIN_HEARTBEATS),
+        )
+        table = SQL.identifier(self._log_table())
+        counts = {"sessions": 0, "deleted": 0, "revoked": 0}
+        start = time.monotonic()
+        while time.monotonic() - start < time_budget:
+            self.env.cr.execute(
+                SQL(
+                    """
+                SELECT log.session_identifier
+                FROM %(table)s log
+                JOIN res_users u ON u.id = log.user_id
+                WHERE NOT log.revoked
+                    AND log.last_activity < %(cutoff)s
+                    AND u.custom_field
+                    AND u.active
+                    AND NOT u.share
+                    AND NOT EXISTS (
+                        SELECT 1 FROM %(table)s recent
+                        WHERE recent.session_identifier = log.session_identifier
+                            AND recent.last_activity >= %(cutoff)s
+                    )
+                GROUP BY log.session_identifier
+                LIMIT %(limit)s
+            """,
+                    table=table,
+                    cutoff=cutoff,
+                    limit=batch_size,
+                )
+            )
+            session_identifiers = [row[0] for row in self.env.cr.fetchall()]
+            if not session_identifiers:
+                break
+            counts["sessions"] += len(session_identifiers)
+            counts["deleted"] += self.delete_from_identifiers(session_identifiers) or 0
+            counts["revoked"] += self._revoke_logs(session_identifiers)
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            if len(session_identifiers) < batch_size:
+                break
+
+        if counts["sessions"]:
+            _logger.info(
+                "Swept %(sessions)d idle sessions: %(deleted)d deleted from the "
+                "store, %(revoked)d logs revoked",
+                counts,
+            )
+        return counts
+
+    @api.model
+    def _revoke_logs(self, session_identifiers):
+        """Mark every log of ``session_identifiers`` as revoked, older
+        partitions included.
+
+        :return: number of revoked logs
+        """
+        self.env.cr.execute(
+            SQL(
+                """
+            UPDATE %(table)s
+            SET revoked = true
+            WHERE NOT revoked AND session_identifier = ANY(%(sids)s)
+        """,
+                table=SQL.identifier(self._log_table()),
+                sids=list(session_identifiers),
+            )
+        )
+        revoked = self.env.cr.rowcount
+        self.env["res.device.log"].invalidate_model(["revoked"])
+        self._refresh_latest_devices(session_identifiers)
+        return revoked
+
+    def delete_from_identifiers(self, identifiers):
+        """Delete the sessions of ``identifiers`` through the session store.
+
+        :return: number of deleted sessions
+        """
+        with revocation_seconds.time():
+            deleted = session_revoker.delete_sessions(identifiers)
+        revoked_sessions.inc(deleted or 0)
+        _logger.debug(
+            "Deleted %s sessions from %d identifiers", deleted, len(identifiers)
+        )
+        return deleted
 
     @api.autovacuum
     def _gc_device_log(self):
+        self._gc_linked_ip_addresses()
+        if self._is_upsert_mode():
+            # The unique index already keeps a single row per device
+            self._ensure_upsert_index()
+            return
+        self._drop_upsert_index()
         # Keep the last device log
         # (even if the session file no longer exists on the filesystem)
         self.env.cr.execute(
@@ -290,6 +1324,7 @@ class ResDeviceLog(models.Model):
             )
         """
         )
+        gc_deleted_logs.inc(self.env.cr.rowcount)
         _logger.info("GC device logs delete %d entries", self.env.cr.rowcount)
 
 
@@ -466,14 +1501,9 @@ class ResDevice(models.Model):
         try:
             must_logout = bool(self.filtered("is_current"))
 
-            deleted_count = root.session_store.delete_from_identifiers(
-                session_identifiers
-            )
+            deleted_count = ResDeviceLog.delete_from_identifiers(session_identifiers)
 
-            revoked_devices = ResDeviceLog.sudo().search(
-                [("session_identifier", "in", session_identifiers)]
-            )
-            revoked_devices.write({"revoked": True})
+            revoked_count = ResDeviceLog.sudo()._revoke_logs(session_identifiers)
 
             _logger.info(
                 "User %d revokes devices (%s)",
@@ -502,10 +1532,10 @@ class ResDevice(models.Model):
                     "(%(deleted)s eliminadas del almacén)."
                 )
                 % {
-                    "count": len(revoked_devices),
+                    "count": revoked_count,
                     "deleted": deleted_count,
                 },
-                "revoked_count": len(revoked_devices),
+                "revoked_count": revoked_count,
                 "deleted_count": deleted_count,
             }
         except Exception as e:
@@ -521,15 +1551,15 @@ class ResDevice(models.Model):
 
     @api.model
     def _from(self):
-        return "FROM res_device_log D"
+        return f"FROM {self._log_table()} D"
 
     @api.model
     def _where(self):
-        return """
+        return f"""
             WHERE
                 NOT EXISTS (
                     SELECT 1
-                    FROM res_device_log D2
+                    FROM {self._log_table()} D2
                     WHERE
                         D2.user_id = D.user_id
                         AND D2.session_identifier = D.session_identifier
@@ -545,11 +1575,62 @@ class ResDevice(models.Model):
         """
 
     @property
-    def _query(self):
+    def _live_query(self):
         return f"{self._select()} {self._from()} {self._where()}"
 
+    def _use_session_table(self):
+        """Whether ``res.device`` is read from the database session store."""
+        if (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("res_device.device_source", "log")
+            != "session_store"
+        ):
+            return False
+        return tools.table_exists(self.env.cr, SESSION_TABLE)
+
+    @property
+    def _session_query(self):
+        """One device per session of this database, from the session store."""
+        columns = {
+            "id": "S.id",
+            "session_identifier": "S.session_identifier",
+            "platform": "S.platform",
+            "browser": "S.browser",
+            "ip_address": "S.ip_address",
+            "country": "S.country",
+            "city": "S.city",
+            "device_type": "S.device_type",
+            "user_id": "S.uid",
+            "first_activity": "S.first_activity",
+            "last_activity": "S.last_activity",
+            "revoked": "false",
+            "geo_pending": "false",
+            "create_date": "S.first_activity",
+            "write_date": "S.write_date",
+        }
+        select = ", ".join(
+            f'{columns.get(name, f"NULL::{field.column_type[1]}")} AS "{name}"'
+            for name, field in self._fields.items()
+            if field.store and field.column_type
+        )
+        return f"""
+            SELECT {select}
+            FROM {SESSION_TABLE} S
+            WHERE S.db = current_database() AND S.uid IS NOT NULL
+        """
+
+    @property
+    def _query(self):
+        if self._use_session_table():
+            return self._session_query
+        if self.env["res.device.log"]._use_latest_table():
+            return f"{self._select()} FROM {LATEST_TABLE} D"
+        return self._live_query
+
     def init(self):
         tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env["res.device.log"]._setup_latest_devices()
         self.env.cr.execute(
             SQL(
                 """
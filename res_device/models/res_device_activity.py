@@ -0,0 +1,198 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+ROLLUP_KEY = SQL(
+    """date, COALESCE(user_id, 0), COALESCE(device_type, ''),
+    COALESCE(country, ''), COALESCE(platform, '')"""
+)
+# Sessions already counted per day and rollup key, so that a session is only
+# counted once however many logs it has that day.
+SEEN_TABLE = "res_device_activity_session"
+WATERMARK_PARAM = "res_device.rollup_watermark"
+
+
+class ResDeviceActivityDaily(models.Model):
+    _name = "res.device.activity.daily"
+    _description = "Daily Device Activity"
+    _order = "date desc"
+
+    date = fields.Date(required=True, index=True, readonly=True)
+    user_id = fields.Many2one("res.users", index=True, readonly=True)
+    device_type = fields.Selection(
+        [("computer", "Computer"), ("mobile", "Mobile")],
+        "Device Category",
+        readonly=True,
+    )
+    country = fields.Char(readonly=True)
+    platform = fields.Char(readonly=True)
+    log_count = fields.Integer(
+        "Activity Updates",
+        readonly=True,
+        group_operator="sum",
+        help="Device log rows whose last activity fell on this day. With "
+        "upserts (res_device.log_upsert) a device keeps a single row, so each "
+        "activity update rolled up counts again.",
+    )
+    session_count = fields.Integer("Sessions", readonly=True, group_operator="sum")
+
+    def init(self):
+        self.env.cr.execute(
+            SQL(
+                """
+            CREATE UNIQUE INDEX IF NOT EXISTS %(key_idx)s ON %(table)s(%(key)s);
+            CREATE TABLE IF NOT EXISTS %(seen)s (
+                date date NOT NULL,
+                user_id integer NOT NULL,
+                device_type varchar NOT NULL,
+                country varchar NOT NULL,
+                platform varchar NOT NULL,
+                session_identifier varchar NOT NULL,
+                PRIMARY KEY (
+                    date, user_id, device_type, country, platform,
+                    session_identifier
+                )
+            );
+        """,
+                key_idx=SQL.identifier(f"{self._table}__key_idx"),
+                table=SQL.identifier(self._table),
+                key=ROLLUP_KEY,
+                seen=SQL.identifier(SEEN_TABLE),
+            )
+        )
+
+    def _rollup_window(self, start, end):
+        """Add the logs whose ``last_activity`` is in ``[start, end)``.
+
+        :return: number of rollup rows inserted or updated
+        """
+        self.env.cr.execute(
+            SQL(
+                """
+            WITH src AS (
+                SELECT
+                    last_activity::date AS date,
+                    COALESCE(user_id, 0) AS user_id,
+                    COALESCE(device_type, '') AS device_type,
+                    COALESCE(country, '') AS country,
+                    COALESCE(platform, '') AS platform,
+                    session_identifier
+                FROM %(log)s
+                WHERE last_activity >= %(start)s AND last_activity < %(end)s
+            ),
+            seen AS (
+                INSERT INTO %(seen)s
+                SELECT DISTINCT * FROM src
+                ON CONFLICT DO NOTHING
+                RETURNING date, user_id, device_type, country, platform
+            ),
+            sessions AS (
+                SELECT date, user_id, device_type, country, platform,
+                    count(*) AS session_count
+                FROM seen
+                GROUP BY date, user_id, device_type, country, platform
+            ),
+            logs AS (
+                SELECT date, user_id, device_type, country, platform,
+                    count(*) AS log_count
+                FROM src
+                GROUP BY date, user_id, device_type, country, platform
+            )
+            INSERT INTO %(table)s AS rollup (
+                date, user_id, device_type, country, platform,
+                log_count, session_count, create_date, write_date
+            )
+            SELECT
+                logs.date,
+                NULLIF(logs.user_id, 0),
+                NULLIF(logs.device_type, ''),
+                NULLIF(logs.country, ''),
+                NULLIF(logs.platform, ''),
+                logs.log_count,
+                COALESCE(sessions.session_count, 0),
+                now() at time zone 'UTC',
+                now() at time zone 'UTC'
+            FROM logs
+            LEFT JOIN sessions
+                USING (date, user_id, device_type, country, platform)
+            ON CONFLICT (%(key)s) DO UPDATE SET
+                log_count = rollup.log_count + EXCLUDED.log_count,
+                session_count = rollup.session_count + EXCLUDED.session_count,
+                write_date = EXCLUDED.write_date
+        """,
+                table=SQL.identifier(self._table),
+                log=SQL.identifier(self.env["res.device.log"]._log_table()),
+                seen=SQL.identifier(SEEN_TABLE),
+                key=ROLLUP_KEY,
+                start=start,
+                end=end,
+            )
+        )
+        return self.env.cr.rowcount
+
+    @api.model
+    def _cron_rollup_device_activity(self):
+        """Roll the device logs up into daily rows, from the last watermark.
+
+        Logs are read by ``last_activity`` up to
+        ``res_device.rollup_lag_minutes`` minutes ago (5 by default) and never
+        past a log whose location is still pending, so the logs still being
+        written are left to the next run; each day is committed with its
+        watermark.
+
+        :return: number of rollup rows inserted or updated
+        """
+        ICP = self.env["ir.config_parameter"].sudo()
+        lag = int(ICP.get_param("res_device.rollup_lag_minutes", 5))
+        time_budget = float(ICP.get_param("res_device.rollup_time_budget", 300))
+
+        end = datetime.now() - timedelta(minutes=lag)
+        log = SQL.identifier(self.env["res.device.log"]._log_table())
+        # Logs still waiting for their location would stay in the empty country
+        # bucket forever, stop before the oldest of them
+        self.env.cr.execute(
+            SQL("SELECT min(last_activity) FROM %s WHERE geo_pending", log)
+        )
+        oldest_pending = self.env.cr.fetchone()[0]
+        if oldest_pending:
+            end = min(end, oldest_pending)
+        watermark = ICP.get_param(WATERMARK_PARAM)
+        if watermark:
+            start = fields.Datetime.to_datetime(watermark)
+        else:
+            self.env.cr.execute(SQL("SELECT min(last_activity) FROM %s", log))
+            start = self.env.cr.fetchone()[0]
+        if not start or start >= end:
+            return 0
+
+        updated = 0
+        begin = time.monotonic()
+        while start < end and time.monotonic() - begin < time_budget:
+            next_day = start.date() + timedelta(days=1)
+            window_end = min(
+                end, datetime(next_day.year, next_day.month, next_day.day)
+            )
+            updated += self._rollup_window(start, window_end)
+            # Days before the watermark are complete, their sessions can go
+            self.env.cr.execute(
+                SQL(
+                    "DELETE FROM %s WHERE date < %s",
+                    SQL.identifier(SEEN_TABLE),
+                    window_end.date(),
+                )
+            )
+            ICP.set_param(WATERMARK_PARAM, fields.Datetime.to_string(window_end))
+            start = window_end
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+        self.invalidate_model()
+        _logger.info("Rolled device activity up to %s (%d rows)", start, updated)
+        return updated
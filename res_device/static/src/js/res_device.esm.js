@@ -2,54 +2,111 @@
 
 import {browser} from "@web/core/browser/browser";
 import {registry} from "@web/core/registry";
+import {session} from "@web/session";
+
+// Only one tab of the browser (the one holding the lease) sends heartbeats.
+const LEASE_KEY = "res_device.heartbeat_leader";
+const FIRST_DELAY = 2000;
+const DEFAULT_INTERVAL = 300000;
+const MIN_RETRY_DELAY = 5000;
 
 export const deviceService = {
     dependencies: ["rpc"],
     start(_, {rpc}) {
-        let requestSent = false;
-
-        const updateDevice = async () => {
-            if (!requestSent) {
-                try {
-                    requestSent = true;
-                    await rpc("/web/session/update_device", {});
-                    console.log("Device information updated successfully");
-                } catch (error) {
-                    console.error("Failed to update device information:", error);
-                    requestSent = false;
-                }
+        if (session.res_device_websocket) {
+            // Activity is recorded server side from the bus websocket
+            return;
+        }
+        const tabId = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        let interval = DEFAULT_INTERVAL;
+        let failures = 0;
+        let timeout = null;
+
+        const readLease = () => {
+            try {
+                return JSON.parse(browser.localStorage.getItem(LEASE_KEY));
+            } catch {
+                return null;
+            }
+        };
+
+        const claimLease = () => {
+            const lease = readLease();
+            const now = Date.now();
+            if (lease && lease.tabId !== tabId && lease.expires > now) {
+                return false;
             }
+            browser.localStorage.setItem(
+                LEASE_KEY,
+                JSON.stringify({tabId, expires: now + interval * 2})
+            );
+            // Another tab may have written at the same time, last write wins
+            return readLease()?.tabId === tabId;
         };
 
-        browser.setTimeout(() => {
-            updateDevice();
-        }, 2000);
+        const releaseLease = () => {
+            if (readLease()?.tabId === tabId) {
+                browser.localStorage.removeItem(LEASE_KEY);
+            }
+        };
+
+        const jitter = (delay) => delay * (0.8 + Math.random() * 0.4);
+
+        const nextDelay = () => {
+            if (!failures) {
+                return jitter(interval);
+            }
+            // Exponential backoff with jitter, never slower than the heartbeat
+            const backoff = Math.min(interval, MIN_RETRY_DELAY * 2 ** (failures - 1));
+            return backoff / 2 + Math.random() * (backoff / 2);
+        };
 
-        const userActivityEvents = ["visibilitychange"];
+        const schedule = (delay) => {
+            browser.clearTimeout(timeout);
+            timeout = browser.setTimeout(heartbeat, delay);
+        };
 
-        const activityListeners = {};
-        userActivityEvents.forEach((eventType) => {
-            const listener = () => {
-                if (
-                    eventType === "visibilitychange" &&
-                    document.visibilityState === "visible" &&
-                    !requestSent
-                ) {
-                    updateDevice();
+        const heartbeat = async () => {
+            if (!claimLease()) {
+                // Follower: check again whether the leader is still alive
+                schedule(jitter(interval));
+                return;
+            }
+            try {
+                const result = await rpc(
+                    "/web/session/update_device",
+                    {},
+                    {silent: true}
+                );
+                failures = result && result.success ? 0 : failures + 1;
+                if (result && result.heartbeat_interval) {
+                    interval = Math.max(
+                        result.heartbeat_interval * 1000,
+                        MIN_RETRY_DELAY
+                    );
                 }
-            };
-            activityListeners[eventType] = listener;
-            browser.addEventListener(window, eventType, listener);
-        });
+            } catch (error) {
+                failures++;
+                console.error("Failed to update device information:", error);
+            }
+            schedule(nextDelay());
+        };
+
+        const onVisibilityChange = () => {
+            if (document.visibilityState === "visible" && failures) {
+                schedule(nextDelay());
+            }
+        };
+
+        schedule(FIRST_DELAY);
+        document.addEventListener("visibilitychange", onVisibilityChange);
+        browser.addEventListener("pagehide", releaseLease);
 
         return () => {
-            userActivityEvents.forEach((eventType) => {
-                browser.removeEventListener(
-                    window,
-                    eventType,
-                    activityListeners[eventType]
-                );
-            });
+            browser.clearTimeout(timeout);
+            releaseLease();
+            document.removeEventListener("visibilitychange", onVisibilityChange);
+            browser.removeEventListener("pagehide", releaseLease);
         };
     },
 };
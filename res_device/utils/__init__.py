@@ -0,0 +1,7 @@
+from . import cache
+from . import device_log_buffer
+from . import geoip
+from . import metrics
+from . import session_revoker
+from . import session_store
+from . import user_agent
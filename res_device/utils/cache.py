@@ -0,0 +1,62 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded, thread-safe mapping whose entries expire after ``ttl`` seconds.
+
+    When full, the entries inserted first are evicted first.
+    """
+
+    def __init__(self, ttl, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value=True, ttl=None):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_params = TTLCache(ttl=60, max_size=1000)
+
+
+def get_param(env, key, default=None):
+    """``ir.config_parameter`` value, kept one minute in this worker."""
+    cache_key = (env.cr.dbname, key)
+    value = _params.get(cache_key)
+    if value is None:
+        value = env["ir.config_parameter"].sudo().get_param(key, default)
+        _params.set(cache_key, value)
+    return value
@@ -0,0 +1,171 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from odoo import SUPERUSER_ID, api
+from odoo.modules.registry import Registry
+from odoo.service.model import retrying
+
+_logger = logging.getLogger(__name__)
+
+# Rows waiting to be written, one buffer per database served by this worker.
+_buffers = {}
+_buffers_lock = threading.Lock()
+_wakeup = threading.Event()
+_flusher = None
+_flusher_pid = None
+
+
+def row_key(row):
+    """Rows sharing this key are merged in the buffer (same key as the GC)."""
+    return (
+        row["session_identifier"],
+        row["platform"] or "",
+        row["browser"] or "",
+        row["ip_address"] or "",
+    )
+
+
+def merge_rows(pending, row):
+    """Merge two rows of the same key, keeping the widest activity window."""
+    return dict(
+        row,
+        first_activity=min(pending["first_activity"], row["first_activity"]),
+        last_activity=max(pending["last_activity"], row["last_activity"]),
+    )
+
+
+class DeviceLogBuffer:
+    """Write-behind buffer of ``res_device_log`` rows for one database.
+
+    Rows are merged by :func:`row_key` so a session that is seen several times
+    before a flush only produces one row, carrying its latest activity.
+    """
+
+    def __init__(self, dbname):
+        self.dbname = dbname
+        self.max_size = 500
+        self.max_delay = 10.0
+        self._rows = {}
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, row):
+        with self._lock:
+            key = row_key(row)
+            pending = self._rows.get(key)
+            if pending:
+                row = merge_rows(pending, row)
+            elif self._oldest is None:
+                self._oldest = time.monotonic()
+            self._rows[key] = row
+            return self._is_due()
+
+    def _is_due(self):
+        if not self._rows:
+            return False
+        if len(self._rows) >= self.max_size:
+            return True
+        return time.monotonic() - self._oldest >= self.max_delay
+
+    def is_due(self):
+        with self._lock:
+            return self._is_due()
+
+    def drain(self):
+        with self._lock:
+            rows = list(self._rows.values())
+            self._rows.clear()
+            self._oldest = None
+            return rows
+
+    def flush(self):
+        """Write the buffered rows in one transaction.
+
+        Serialization failures against the requests writing the same devices
+        are retried like the HTTP requests are, the rows are only lost once
+        the retries are exhausted.
+        """
+        rows = self.drain()
+        if not rows:
+            return 0
+        try:
+            registry = Registry(self.dbname)
+            with registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                retrying(
+                    lambda: env["res.device.log"]._insert_device_logs(env, rows),
+                    env,
+                )
+        except Exception:
+            _logger.exception(
+                "Could not flush %d buffered device logs of database %s",
+                len(rows),
+                self.dbname,
+            )
+            return 0
+        return len(rows)
+
+
+def get_buffer(dbname):
+    with _buffers_lock:
+        buffer = _buffers.get(dbname)
+        if buffer is None:
+            buffer = _buffers[dbname] = DeviceLogBuffer(dbname)
+        return buffer
+
+
+def enqueue(dbname, row, max_size=None, max_delay=None):
+    """Queue ``row`` for ``dbname``; the flusher thread writes it later."""
+    buffer = get_buffer(dbname)
+    if max_size:
+        buffer.max_size = max_size
+    if max_delay:
+        buffer.max_delay = max_delay
+    _ensure_flusher()
+    if buffer.add(row):
+        _wakeup.set()
+
+
+def flush_all(force=True):
+    """Flush every buffer (only the due ones unless ``force``)."""
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    count = 0
+    for buffer in buffers:
+        if force or buffer.is_due():
+            count += buffer.flush()
+    return count
+
+
+def _flusher_loop():
+    while True:
+        _wakeup.wait(timeout=1.0)
+        _wakeup.clear()
+        flush_all(force=False)
+
+
+def _ensure_flusher():
+    # Threads do not survive a fork, prefork workers start their own flusher.
+    global _flusher, _flusher_pid
+    if _flusher_pid == os.getpid() and _flusher.is_alive():
+        return
+    with _buffers_lock:
+        if _flusher_pid == os.getpid() and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(
+            target=_flusher_loop, name="res_device.log_flusher", daemon=True
+        )
+        _flusher_pid = os.getpid()
+        _flusher.start()
+
+
+atexit.register(flush_all)
@@ -0,0 +1,32 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+from odoo.http import GeoIP
+
+from .cache import TTLCache
+
+# IP address -> (country, city), GeoIP databases are reopened only on restart
+_locations = TTLCache(ttl=24 * 3600, max_size=50000)
+
+
+def lookup(ip_address):
+    """Return the ``(country, city)`` of ``ip_address``.
+
+    ``GeoIP`` reads the databases through the reader each worker opens once
+    (memory mapped), this only saves the repeated lookups of the same IP.
+    """
+    if not ip_address:
+        return (None, None)
+    location = _locations.get(ip_address)
+    if location is None:
+        geoip = GeoIP(ip_address)
+        location = (geoip.get("country_name"), geoip.get("city"))
+        _locations.set(ip_address, location)
+    return location
+
+
+def cached(ip_address):
+    """Like :func:`lookup` without querying GeoIP, ``None`` when not known."""
+    if not ip_address:
+        return (None, None)
+    return _locations.get(ip_address)
@@ -0,0 +1,116 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+"""In-process counters and latency histograms, rendered in Prometheus text.
+
+Every worker keeps its own values; samples carry a ``pid`` label so the
+series of the different workers do not overwrite each other.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield self.name, {}, self.value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            yield f"{self.name}_bucket", {"le": le}, cumulative
+        yield f"{self.name}_sum", {}, total
+        yield f"{self.name}_count", {}, cumulative
+
+
+def _register(cls, name, *args):
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, *args)
+        return metric
+
+
+def counter(name, documentation):
+    return _register(Counter, name, documentation)
+
+
+def histogram(name, documentation, buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, documentation, buckets)
+
+
+def _format_labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def render(extra=()):
+    """Prometheus text exposition of every metric of this worker.
+
+    :param extra: ``(name, type, documentation, value)`` of values computed at
+        scrape time
+    """
+    pid = os.getpid()
+    lines = []
+    with _metrics_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            labels = _format_labels({"pid": pid, **labels})
+            lines.append(f"{name}{{{labels}}} {value}")
+    for name, metric_type, documentation, value in extra:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name}{{{_format_labels({'pid': pid})}}} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,84 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import logging
+import os
+import re
+from collections import defaultdict
+
+from odoo.http import root
+
+_logger = logging.getLogger(__name__)
+
+# Session identifiers are the first 42 characters of a url-safe sid. Shorter
+# ones are refused, like Odoo does, so a prefix can not match other sessions.
+IDENTIFIER_RE = re.compile(r"^[\w-]{42,}$")
+
+
+def delete_sessions(identifiers, session_store=None):
+    """Delete the sessions of ``identifiers`` from the configured session store.
+
+    Filesystem stores are handled in bulk: identifiers are grouped by shard
+    directory, each directory is opened once and scanned once, and files are
+    unlinked relative to its descriptor. Other stores are asked to delete the
+    sessions themselves.
+
+    :return: number of deleted sessions (``None`` if the store does not say)
+    """
+    store = session_store or root.session_store
+    identifiers = {
+        identifier[:42]
+        for identifier in identifiers
+        if identifier and IDENTIFIER_RE.match(identifier)
+    }
+    if not identifiers:
+        return 0
+    path = getattr(store, "path", None)
+    if not path:
+        return store.delete_from_identifiers(list(identifiers))
+    return _delete_session_files(path, identifiers)
+
+
+def delete_user_sessions(dbname, uids, session_store=None):
+    """Delete every session of ``uids`` in ``dbname`` when the store can.
+
+    :return: number of deleted sessions, ``None`` if the store does not know
+             the users of its sessions
+    """
+    store = session_store or root.session_store
+    if not hasattr(store, "delete_from_uids"):
+        return None
+    if not uids:
+        return 0
+    return store.delete_from_uids(dbname, uids)
+
+
+def _delete_session_files(path, identifiers):
+    by_shard = defaultdict(set)
+    for identifier in identifiers:
+        by_shard[identifier[:2]].add(identifier)
+
+    deleted = 0
+    for shard, shard_identifiers in by_shard.items():
+        try:
+            dir_fd = os.open(os.path.join(path, shard), os.O_RDONLY | os.O_DIRECTORY)
+        except FileNotFoundError:
+            continue
+        try:
+            with os.scandir(dir_fd) as entries:
+                names = [
+                    entry.name
+                    for entry in entries
+                    if entry.name[:42] in shard_identifiers
+                ]
+            for name in names:
+                try:
+                    os.unlink(name, dir_fd=dir_fd)
+                    deleted += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    _logger.error("Error deleting session file %s: %s", name, e)
+        finally:
+            os.close(dir_fd)
+    return deleted
@@ -0,0 +1,196 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+"""Optional PostgreSQL session store.
+
+Enabled with the ``res_device_session_db_uri`` server option (a database
+name or a ``postgresql://`` URI). Each session is a row of
+:data:`SESSION_TABLE` that also carries its device trace, so the devices of a
+session can be read, and its sessions revoked, with plain SQL.
+"""
+
+import json
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from odoo import http, sql_db
+from odoo.tools import config, lazy_property
+from odoo.tools._vendor import sessions
+
+from . import geoip
+
+_logger = logging.getLogger(__name__)
+
+SESSION_TABLE = "res_device_session"
+
+
+class PGSessionStore(sessions.SessionStore):
+    # Same keys as the filesystem store: 84 url-safe characters
+    generate_key = http.FilesystemSessionStore.generate_key
+    is_valid_key = http.FilesystemSessionStore.is_valid_key
+    rotate = http.FilesystemSessionStore.rotate
+
+    def __init__(self, uri, session_class=None):
+        super().__init__(session_class)
+        self.uri = uri
+
+    @contextmanager
+    def cursor(self):
+        cr = sql_db.db_connect(self.uri, allow_uri=True).cursor()
+        try:
+            yield cr
+            cr.commit()
+        except Exception:
+            cr.rollback()
+            raise
+        finally:
+            cr.close()
+
+    def setup(self):
+        """Create the sessions table, unless it already exists.
+
+        Meant to be called once per process, before the store is used: the
+        indexes take a lock on the table that would serialize the saves.
+        """
+        with self.cursor() as cr:
+            cr.execute("SELECT to_regclass(%s)", [SESSION_TABLE])
+            if cr.fetchone()[0]:
+                return
+            cr.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {SESSION_TABLE} (
+                    id bigint GENERATED BY DEFAULT AS IDENTITY UNIQUE,
+                    sid varchar PRIMARY KEY,
+                    session_identifier varchar
+                        GENERATED ALWAYS AS (left(sid, 42)) STORED,
+                    db varchar,
+                    uid integer,
+                    payload text NOT NULL,
+                    platform varchar,
+                    browser varchar,
+                    ip_address varchar,
+                    country varchar,
+                    city varchar,
+                    device_type varchar,
+                    first_activity timestamp,
+                    last_activity timestamp,
+                    write_date timestamp NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS {SESSION_TABLE}__identifier_idx
+                    ON {SESSION_TABLE}(session_identifier);
+                CREATE INDEX IF NOT EXISTS {SESSION_TABLE}__db_uid_idx
+                    ON {SESSION_TABLE}(db, uid);
+                CREATE INDEX IF NOT EXISTS {SESSION_TABLE}__write_date_idx
+                    ON {SESSION_TABLE}(write_date);
+            """
+            )
+
+    def get(self, sid):
+        if not self.is_valid_key(sid):
+            return self.new()
+        with self.cursor() as cr:
+            cr.execute(f"SELECT payload FROM {SESSION_TABLE} WHERE sid = %s", [sid])
+            row = cr.fetchone()
+        data = {}
+        if row:
+            try:
+                data = json.loads(row[0])
+            except ValueError:
+                _logger.warning("Could not load the session %s", sid[:10])
+        return self.session_class(data, sid, False)
+
+    def save(self, session):
+        data = dict(session)
+        trace = data.get("trace") or {}
+        ip_address = trace.get("ip_address")
+        country, city = geoip.cached(ip_address) or (None, None)
+        first_activity = trace.get("first_activity")
+        last_activity = trace.get("last_activity")
+        with self.cursor() as cr:
+            cr.execute(
+                f"""
+                INSERT INTO {SESSION_TABLE} (
+                    sid, db, uid, payload, platform, browser, ip_address,
+                    country, city, device_type, first_activity, last_activity,
+                    write_date
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                    now() at time zone 'UTC')
+                ON CONFLICT (sid) DO UPDATE SET
+                    db = EXCLUDED.db,
+                    uid = EXCLUDED.uid,
+                    payload = EXCLUDED.payload,
+                    platform = EXCLUDED.platform,
+                    browser = EXCLUDED.browser,
+                    ip_address = EXCLUDED.ip_address,
+                    country = COALESCE(EXCLUDED.country, {SESSION_TABLE}.country),
+                    city = COALESCE(EXCLUDED.city, {SESSION_TABLE}.city),
+                    device_type = EXCLUDED.device_type,
+                    first_activity = EXCLUDED.first_activity,
+                    last_activity = EXCLUDED.last_activity,
+                    write_date = EXCLUDED.write_date
+            """,
+                [
+                    session.sid,
+                    data.get("db"),
+                    data.get("uid"),
+                    json.dumps(data),
+                    trace.get("platform"),
+                    trace.get("browser"),
+                    ip_address,
+                    country,
+                    city,
+                    trace.get("device_type"),
+                    first_activity and datetime.fromtimestamp(first_activity),
+                    last_activity and datetime.fromtimestamp(last_activity),
+                ],
+            )
+
+    def delete(self, session):
+        with self.cursor() as cr:
+            cr.execute(f"DELETE FROM {SESSION_TABLE} WHERE sid = %s", [session.sid])
+
+    def delete_from_identifiers(self, identifiers):
+        with self.cursor() as cr:
+            cr.execute(
+                f"DELETE FROM {SESSION_TABLE} WHERE session_identifier = ANY(%s)",
+                [list(identifiers)],
+            )
+            return cr.rowcount
+
+    def delete_from_uids(self, dbname, uids):
+        """Delete every session of the users ``uids`` of ``dbname``."""
+        with self.cursor() as cr:
+            cr.execute(
+                f"DELETE FROM {SESSION_TABLE} WHERE db = %s AND uid = ANY(%s)",
+                [dbname, list(uids)],
+            )
+            return cr.rowcount
+
+    def vacuum(self, max_lifetime=http.SESSION_LIFETIME):
+        with self.cursor() as cr:
+            cr.execute(
+                f"""
+                DELETE FROM {SESSION_TABLE}
+                WHERE write_date < now() at time zone 'UTC' - %s
+            """,
+                [timedelta(seconds=max_lifetime)],
+            )
+
+
+def session_store(self):
+    # Named after the property: lazy_property caches under the getter's name
+    uri = config.get("res_device_session_db_uri")
+    if uri:
+        store = PGSessionStore(uri, session_class=http.Session)
+        store.setup()
+        return store
+    return _filesystem_session_store(self)
+
+
+_filesystem_session_store = http.Application.session_store.fget
+if config.get("res_device_session_db_uri"):
+    http.Application.session_store = lazy_property(session_store)
+    # Forget the store already built by this process, if any
+    http.root.__dict__.pop("session_store", None)
@@ -0,0 +1,67 @@
+# Copyright 2025 Andreu Sempere - asempere@practicas.ontinet.com
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+MOBILE_PLATFORMS = frozenset(
+    {
+        "android",
+        "iphone",
+        "ipad",
+        "ipod",
+        "blackberry",
+        "windows phone",
+        "webos",
+    }
+)
+
+_OS_VERSION_RE = re.compile(
+    r"(?:Android|CPU (?:iPhone )?OS|Windows NT|Windows Phone|Mac OS X|CrOS \S+)"
+    r"[ /]?([\d._]+)"
+)
+
+ParsedUserAgent = namedtuple(
+    "ParsedUserAgent",
+    ["platform", "browser", "browser_version", "os_version", "device_type"],
+)
+
+
+def device_type(platform):
+    """Device category of the ``res.device.log`` selection for ``platform``."""
+    if platform and platform.lower() in MOBILE_PLATFORMS:
+        return "mobile"
+    return "computer"
+
+
+@lru_cache(maxsize=4096)
+def parse_user_agent(user_agent_string, user_agent_class):
+    """Parse a raw User-Agent once per worker.
+
+    :param user_agent_class: the class the HTTP request parses user agents
+        with, so results match ``httprequest.user_agent``
+    """
+    user_agent = user_agent_class(user_agent_string or "")
+    platform = user_agent.platform or "Unknown"
+    match = _OS_VERSION_RE.search(user_agent_string or "")
+    return ParsedUserAgent(
+        platform=platform,
+        browser=user_agent.browser or "Unknown",
+        browser_version=user_agent.version or None,
+        os_version=match.group(1).replace("_", ".").rstrip(".") if match else None,
+        device_type=device_type(platform),
+    )
+
+
+def cache_stats():
+    """Hit/miss counters of :func:`parse_user_agent` in this worker."""
+    info = parse_user_agent.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }